@@ -0,0 +1,102 @@
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+from benchmarks.supertrend_benchmark import random_ohlc
+from benchmarks.vectorized_benchmark import SETTINGS, TRADE_COLUMNS, same_stats, timed
+from helpers.bar_loop import run_bar_loop
+from helpers.jit import jit_enabled
+from helpers.vectorized import VectorizedBacktest
+
+
+# Run from the repository root with: python -m benchmarks.bar_loop_benchmark [ticker] [number of bars]
+
+
+def strategy_params():
+	from strategies.mean_reversal.bband_rsi.bband_rsi import BBandRsi
+	from strategies.mean_reversal.nine_one.nine_one import NineOne
+
+	return [
+		(BBandRsi, [
+			{}, {'order_time_max': 1, 'trade_time_max': 3, 'buy_limit_offset': 1}, {'sma_length': 50, 'stoploss_factor': 1},
+			{'sma_streak': 2}
+		]),
+		(NineOne, [{}, {'ema_length': 4}, {'ema_length': 20}]),
+	]
+
+
+def reference_run(data, strategy, params, settings):
+	return Backtest(data, strategy, **settings).run(**params)
+
+
+def check_parity(data, strategy, params, jit):
+	# trade for trade comparison of the bar loop against Backtest.run
+	failures = 0
+
+	for settings in SETTINGS + [{'margin': .5}]:
+		reference = reference_run(data, strategy, params, settings)
+		stats = VectorizedBacktest(data, strategy, jit=jit, **settings).run(**params)
+
+		expected = reference._trades[TRADE_COLUMNS].to_numpy(dtype=float)
+		trades = stats._trades[TRADE_COLUMNS].to_numpy(dtype=float)
+
+		same_trades = expected.shape == trades.shape and np.allclose(expected, trades, rtol=1e-12, atol=1e-9)
+		same_equity = np.allclose(reference._equity_curve['Equity'], stats._equity_curve['Equity'], rtol=1e-12)
+
+		if not (same_trades and same_equity and same_stats(reference, stats)):
+			failures += 1
+			print(f"  MISMATCH {strategy.__name__}{params} {settings}: {len(expected)} trades expected, {len(trades)} found")
+
+	return failures
+
+
+def random_data(n_bars):
+	high, low, close = random_ohlc(n_bars)
+	open_ = np.r_[close[0], close[:-1]]
+
+	return pd.DataFrame(
+		{'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': 1.},
+		index=pd.date_range('2020-01-01', periods=n_bars, freq='min')
+	)
+
+
+def run(ticker='SPY', n_bars=2_000_000):
+	from helpers.functions import DATA_DIR, CsvDirectoryProvider
+
+	warnings.filterwarnings('ignore')
+	data = CsvDirectoryProvider(DATA_DIR).get_ohlc_data(ticker, '2000-01-01', '2024-01-01', '1d')
+	minutes = random_data(n_bars)
+	print(f"{ticker}: {len(data)} candles, random walk: {n_bars} candles")
+
+	failures = 0
+	for strategy, runs in strategy_params():
+		for params in runs:
+			for jit in ([True, False] if jit_enabled() else [False]):
+				failures += check_parity(data, strategy, params, jit)
+
+		reference_time, _ = timed(reference_run, data=data, strategy=strategy, params={}, settings={})
+		elapsed, _ = timed(VectorizedBacktest(data, strategy).simulate)
+		print(
+			f"  {strategy.__name__ + ' run':<16} Backtest {reference_time:6.3f} s  bar loop {elapsed:6.4f} s  "
+			f"({reference_time / elapsed:6.1f}x)"
+		)
+
+		# bars per second of the loop, after a first run that compiles it
+		arguments = strategy.bar_loop(minutes)
+		run_bar_loop(minutes.iloc[:1000], **strategy.bar_loop(minutes.iloc[:1000]))
+		elapsed, simulation = timed(run_bar_loop, data=minutes, **arguments)
+		print(f"  {strategy.__name__ + ' loop':<16} {len(simulation):6d} trades  {n_bars / elapsed / 1e6:6.2f} M bars/s")
+
+	print('parity: ' + ('ok' if not failures else f'{failures} mismatches'))
+
+	return failures
+
+
+if __name__ == "__main__":
+	sys.exit(1 if run(
+		sys.argv[1] if len(sys.argv) > 1 else 'SPY',
+		int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000
+	) else 0)
@@ -0,0 +1,81 @@
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+from backtesting import Backtest
+
+from benchmarks.vectorized_benchmark import same_stats
+from helpers.functions import DATA_DIR, CsvDirectoryProvider
+from helpers.mmap_store import MmapOhlcStore
+from results.strategy_tester import StrategyTester
+
+
+# Run from the repository root with: python -m benchmarks.chunked_benchmark [ticker]
+#
+# Checks that StrategyTester.run_chunked_backtests gives the statistics of a single backtest over the whole history,
+# with positions carried over from chunk to chunk, and times both.
+
+
+def strategies():
+	from strategies.mean_reversal.nine_one.nine_one import NineOne
+	from strategies.mean_reversal.rsi_oscillator.rsi_oscillator import RsiOscillator
+	from strategies.trend_following.max_min.max_min import MaxMin
+	from strategies.trend_following.sma_cross.sma_cross import SmaCross
+
+	# SmaCross is always in the market, and NineOne keeps its stop price in an attribute
+	return [SmaCross, MaxMin, RsiOscillator, NineOne]
+
+
+# (start date, chunk size, warmup): with 500 bars and 100 of warmup, RsiOscillator makes no trade in the last SPY
+# chunk, and the short series has chunks without any trade
+CASES = [
+	('2014-01-01', 500, 100),
+	('2014-01-01', 300, 200),
+	('2022-01-01', 40, 60),
+]
+
+
+def run(ticker='SPY'):
+	warnings.filterwarnings('ignore')
+	store_dir = tempfile.mkdtemp()
+	failures = 0
+
+	try:
+		store = MmapOhlcStore(store_dir=store_dir, source=CsvDirectoryProvider(DATA_DIR))
+
+		for start_date, chunk_size, warmup in CASES:
+			data_info = {'ticker': ticker, 'start_date': start_date, 'end_date': '2024-01-01', 'interval': '1d'}
+			data = store.get_ohlc_data(ticker, start_date, '2024-01-01', '1d')
+
+			for strategy in strategies():
+				begin = time.perf_counter()
+				reference = Backtest(data, strategy, cash=10_000).run()
+				reference_time = time.perf_counter() - begin
+
+				metrics = [key for key in reference.index if not key.startswith('_')]
+				tester = StrategyTester()
+				tester.add_strategies([strategy])
+
+				begin = time.perf_counter()
+				stats = tester.run_chunked_backtests(data_info, metrics, chunk_size, warmup, store=store).iloc[0]
+				elapsed = time.perf_counter() - begin
+
+				same = same_stats(reference, stats)
+				failures += not same
+				print(
+					f"  {strategy.__name__:<13} {len(data):5d} bars in chunks of {chunk_size:4d} ({warmup:3d} warmup)  "
+					f"{reference['# Trades']:4d} trades  single {reference_time:6.3f} s  chunked {elapsed:6.3f} s  "
+					f"{'ok' if same else 'MISMATCH'}"
+				)
+	finally:
+		shutil.rmtree(store_dir)
+
+	print('parity: ' + ('ok' if not failures else f'{failures} mismatches'))
+
+	return failures
+
+
+if __name__ == "__main__":
+	sys.exit(1 if run(sys.argv[1] if len(sys.argv) > 1 else 'SPY') else 0)
@@ -0,0 +1,205 @@
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+from helpers.backtrader_sweep import ArrayFeed
+from helpers.vectorized import VectorizedBacktest
+
+
+# Run from the repository root with: python -m benchmarks.engine_benchmark [ticker] [report path]
+#
+# Runs each strategy of strategies/ and its counterpart of strategies_backtrader/ on the same csv data, diffs their
+# closed trades, and records the wall time, bars per second and peak memory of every engine in a json report. The
+# vectorized engine (helpers/vectorized.py) is included for the strategies it supports.
+
+CASH = 100_000
+COMMISSION = .001
+
+TRADE_COLUMNS = ['EntryTime', 'ExitTime', 'Size', 'EntryPrice', 'ExitPrice', 'PnL']
+
+
+def strategy_pairs():
+	# (name, backtesting.py strategy, backtrader strategy, backtrader params), both run with their default parameters
+	from strategies.mean_reversal.bband_rsi.bband_rsi import BBandRsi
+	from strategies.mean_reversal.nine_one.nine_one import NineOne
+	from strategies.trend_following.max_min.max_min import MaxMin
+	from strategies.volatility.min_max.min_max import MinMax
+	from strategies_backtrader.mean_reversal import bband_rsi, nine_one
+	from strategies_backtrader.trend_following import max_min
+	from strategies_backtrader.volatility import min_max
+
+	return [
+		('BBandRsi', BBandRsi, bband_rsi.BBandRsi, {'do_logging': False}),
+		('NineOne', NineOne, nine_one.NineOne, {}),
+		('MaxMin', MaxMin, max_min.MaxMinStrategy, {}),
+		('MinMax', MinMax, min_max.MaxMinStrategy, {}),
+	]
+
+
+class TradeList(bt.Analyzer):
+	# closed trades of a backtrader run, with the columns of the backtesting.py trades
+	def start(self):
+		self.opened = {}
+		self.trades = []
+
+	def notify_trade(self, trade):
+		if trade.justopened:
+			self.opened[trade.ref] = (trade.size, trade.price)
+
+		if trade.isclosed:
+			size, entry_price = self.opened.pop(trade.ref)
+			self.trades.append({
+				'EntryTime': bt.num2date(trade.dtopen),
+				'ExitTime': bt.num2date(trade.dtclose),
+				'Size': size,
+				'EntryPrice': entry_price,
+				'ExitPrice': entry_price + trade.pnl / size,
+				'PnL': trade.pnlcomm,
+			})
+
+	def get_analysis(self):
+		return self.trades
+
+
+def run_backtesting(data, strategy, params):
+	stats = Backtest(data, strategy, cash=CASH, commission=COMMISSION).run(**params)
+
+	# trades still open at the end are closed by backtesting.py on the last candle, backtrader leaves them open
+	return stats._trades[stats._trades.ExitBar < len(data) - 1][TRADE_COLUMNS].reset_index(drop=True)
+
+
+def run_vectorized(data, strategy, params):
+	stats = VectorizedBacktest(data, strategy, cash=CASH, commission=COMMISSION).run(**params)
+
+	return stats._trades[stats._trades.ExitBar < len(data) - 1][TRADE_COLUMNS].reset_index(drop=True)
+
+
+def run_backtrader(data, strategy, params):
+	cerebro = bt.Cerebro(stdstats=False, preload=True, runonce=True)
+	cerebro.adddata(ArrayFeed(dataname=data))
+	cerebro.broker.set_cash(CASH)
+	cerebro.broker.setcommission(commission=COMMISSION)
+	cerebro.addanalyzer(TradeList, _name='trades')
+	cerebro.addstrategy(strategy, **params)
+
+	# some strategies print their orders unconditionally
+	with contextlib.redirect_stdout(io.StringIO()):
+		result = cerebro.run()[0]
+
+	return pd.DataFrame(result.analyzers.trades.get_analysis(), columns=TRADE_COLUMNS)
+
+
+def measure(run, data, strategy, params, repeats=3):
+	# best wall time of repeats runs, and the peak of the memory traced on a separate run
+	elapsed = []
+	for _ in range(repeats):
+		begin = time.perf_counter()
+		trades = run(data, strategy, params)
+		elapsed.append(time.perf_counter() - begin)
+
+	tracemalloc.start()
+	run(data, strategy, params)
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	wall_time = min(elapsed)
+
+	return trades, {
+		'wall_time_s': wall_time,
+		'bars_per_s': len(data) / wall_time,
+		'peak_memory_mb': peak / 2 ** 20,
+		'n_trades': len(trades),
+	}
+
+
+def diff_trades(reference, trades):
+	# trades matched by entry and exit time, and the largest price and size differences of the matched ones
+	merged = reference.merge(trades, on=['EntryTime', 'ExitTime'], how='outer', suffixes=('', '_other'), indicator=True)
+	matched = merged[merged._merge == 'both']
+
+	def max_difference(column):
+		return float(np.abs(matched[column] - matched[column + '_other']).max()) if len(matched) else 0.
+
+	return {
+		'matched': len(matched),
+		'only_reference': int((merged._merge == 'left_only').sum()),
+		'only_other': int((merged._merge == 'right_only').sum()),
+		'max_size_difference': max_difference('Size'),
+		'max_entry_price_difference': max_difference('EntryPrice'),
+		'max_exit_price_difference': max_difference('ExitPrice'),
+		'identical': len(matched) == len(merged) and max_difference('Size') == 0 and
+			bool(np.allclose(matched.EntryPrice, matched.EntryPrice_other)) and
+			bool(np.allclose(matched.ExitPrice, matched.ExitPrice_other)),
+	}
+
+
+def run(ticker='SPY', report_path='engine_report.json'):
+	from helpers.functions import DATA_DIR, CsvDirectoryProvider
+
+	warnings.filterwarnings('ignore')
+	data = CsvDirectoryProvider(DATA_DIR).get_ohlc_data(ticker, '2000-01-01', '2024-01-01', '1d')
+	print(f"{ticker}: {len(data)} candles")
+
+	report = {
+		'ticker': ticker,
+		'n_bars': len(data),
+		'start': str(data.index[0]),
+		'end': str(data.index[-1]),
+		'cash': CASH,
+		'commission': COMMISSION,
+		'python': platform.python_version(),
+		'backtrader': bt.__version__,
+		'strategies': [],
+	}
+
+	for name, strategy, bt_strategy, bt_params in strategy_pairs():
+		engines = [('backtesting', run_backtesting, strategy, {}), ('backtrader', run_backtrader, bt_strategy, bt_params)]
+		if hasattr(strategy, 'signals') or hasattr(strategy, 'bar_loop'):
+			engines.append(('vectorized', run_vectorized, strategy, {}))
+
+		results = {engine: measure(run_engine, data, engine_strategy, params)
+				   for engine, run_engine, engine_strategy, params in engines}
+		reference = results['backtesting'][0]
+
+		entry = {
+			'strategy': name,
+			'engines': {engine: metrics for engine, (_, metrics) in results.items()},
+			'parity': {
+				engine: diff_trades(reference, trades) for engine, (trades, _) in results.items() if engine != 'backtesting'
+			},
+		}
+		report['strategies'].append(entry)
+
+		for engine, metrics in entry['engines'].items():
+			parity = entry['parity'].get(engine)
+			print(
+				f"  {name:<9} {engine:<12} {metrics['wall_time_s']:7.3f} s  {metrics['bars_per_s'] / 1e3:8.1f} k bars/s  "
+				f"{metrics['peak_memory_mb']:7.1f} MB  {metrics['n_trades']:4d} trades" +
+				('' if parity is None else
+				 f"  {parity['matched']} matched, {parity['only_reference']} only in backtesting, "
+				 f"{parity['only_other']} only in {engine}")
+			)
+
+	with open(report_path, 'w') as file:
+		json.dump(report, file, indent=2)
+
+	print(f"report written to {report_path}")
+
+	return report
+
+
+if __name__ == "__main__":
+	run(
+		sys.argv[1] if len(sys.argv) > 1 else 'SPY',
+		sys.argv[2] if len(sys.argv) > 2 else 'engine_report.json'
+	)
@@ -0,0 +1,73 @@
+import os
+import re
+import subprocess
+import sys
+
+# Run from the repository root with: python -m benchmarks.import_benchmark [number of runs]
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# heavy dependencies that should only be imported on first use
+HEAVY_MODULES = ['yfinance', 'pandas_ta', 'backtesting.test', 'matplotlib', 'numba']
+
+REPO_PACKAGES = ['helpers', 'results', 'strategies', 'strategies_backtrader', 'benchmarks']
+
+
+def entry_points():
+	# importable modules of the helpers, results and strategies folders
+	modules = ['helpers.functions', 'helpers.indicators', 'results.strategy_tester']
+
+	for folder in ['strategies', 'strategies_backtrader']:
+		for directory, _, files in sorted(os.walk(os.path.join(ROOT_DIR, folder))):
+			for file in sorted(files):
+				if file.endswith('.py'):
+					path = os.path.relpath(os.path.join(directory, file[:-3]), ROOT_DIR)
+					modules.append(path.replace(os.sep, '.'))
+
+	return modules
+
+
+def import_times(module):
+	# cold import of module in a new interpreter, as reported by python -X importtime
+	process = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=ROOT_DIR, capture_output=True, text=True
+	)
+
+	times = {}
+	top_level = {}
+	for line in process.stderr.splitlines():
+		match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)', line)
+		if match is None:
+			continue
+
+		cumulative, indent, name = int(match.group(1)), match.group(2), match.group(3)
+		times[name] = max(times.get(name, 0), cumulative)
+
+		# top level imports of the interpreter
+		if len(indent) == 1:
+			top_level[name] = cumulative
+
+	error = process.stderr.strip().splitlines()[-1] if process.returncode else None
+
+	return sum(top_level.values()) / 1e6, times, top_level, error
+
+
+def run(n_runs=3):
+	print(f"{'entry point':<60} {'import [s]':>10}  {'largest package':<24} heavy dependencies")
+
+	for module in entry_points():
+		runs = [import_times(module) for _ in range(n_runs)]
+		total, times, top_level, error = min(runs, key=lambda run_: run_[0])
+
+		# most expensive package from outside the repository
+		packages = [name for name in times if '.' not in name and name not in REPO_PACKAGES]
+		largest = max(packages, key=times.get, default=None)
+		largest = f'{largest} {times[largest] / 1e6:.2f}s' if largest else '-'
+
+		heavy = ', '.join(f'{name} {times[name] / 1e6:.2f}s' for name in HEAVY_MODULES if name in times)
+		print(f"{module:<60} {total:>10.3f}  {largest:<24} {error or heavy or '-'}")
+
+
+if __name__ == "__main__":
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,78 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from helpers import kernels
+from helpers.jit import compiled, jit_enabled
+
+
+# Run from the repository root with: python -m benchmarks.supertrend_benchmark [number of bars]
+
+
+def random_ohlc(n_bars, seed=0):
+	# random walk candles, with high and low around the open and close
+	rng = np.random.default_rng(seed)
+
+	close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n_bars)))
+	open_ = np.r_[close[0], close[:-1]]
+	high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.002, n_bars))
+	low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.002, n_bars))
+
+	return high, low, close
+
+
+def timed(function, *args, repeat=1):
+	# best time of repeat runs, with the result of the last one
+	best = np.inf
+	for _ in range(repeat):
+		begin = time.perf_counter()
+		result = function(*args)
+		best = min(best, time.perf_counter() - begin)
+
+	return best, result
+
+
+def report(name, elapsed, reference_time=None, same=None):
+	line = f"  {name + ':':<32} {elapsed:8.3f} s"
+
+	if reference_time is not None:
+		line += f"  ({reference_time / elapsed:6.1f}x, {'equal' if same else 'MISMATCH'})"
+
+	print(line)
+
+
+def run(n_bars=1_000_000, length=10, multiplier=3.0, repeat=3):
+	import pandas_ta as ta
+
+	high, low, close = random_ohlc(n_bars)
+	high_series, low_series, close_series = pd.Series(high), pd.Series(low), pd.Series(close)
+
+	print(f"{n_bars} bars, length {length}, multiplier {multiplier}")
+
+	# the pandas_ta supertrend indexes the series one element at a time, so it is only run once
+	reference_time, reference = timed(ta.supertrend, high_series, low_series, close_series, length, multiplier)
+	reference = reference.to_numpy().T
+	report('supertrend pandas_ta', reference_time)
+
+	rows = [('supertrend numpy (python loop)', False)]
+	if jit_enabled():
+		# compile outside of the timing
+		compiled(kernels._supertrend_loop)
+		kernels.supertrend(high[:100], low[:100], close[:100], length, multiplier)
+		rows.append(('supertrend numba', True))
+
+	for name, jit in rows:
+		elapsed, values = timed(kernels.supertrend, high, low, close, length, multiplier, jit, repeat=repeat)
+		report(name, elapsed, reference_time, np.allclose(values, reference, rtol=1e-9, atol=1e-9, equal_nan=True))
+
+	reference_time, reference = timed(ta.dema, close_series, length, repeat=repeat)
+	elapsed, values = timed(kernels.dema, close, length, repeat=repeat)
+
+	report('dema pandas_ta', reference_time)
+	report('dema numpy', elapsed, reference_time, np.allclose(values, reference.to_numpy(), rtol=1e-9, atol=1e-9, equal_nan=True))
+
+
+if __name__ == "__main__":
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,115 @@
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+from helpers.vectorized import VectorizedBacktest, FAST_STATS
+
+
+# Run from the repository root with: python -m benchmarks.vectorized_benchmark [ticker]
+
+TRADE_COLUMNS = ['Size', 'EntryBar', 'ExitBar', 'EntryPrice', 'ExitPrice', 'PnL', 'ReturnPct']
+
+SETTINGS = [
+	{},
+	{'commission': .002},
+	{'trade_on_close': True},
+	{'cash': 1_000, 'commission': .001, 'trade_on_close': True},
+]
+
+
+def strategy_grids():
+	from strategies.volatility.min_max.min_max import MinMax
+	from strategies.trend_following.max_min.max_min import MaxMin
+	from strategies.trend_following.sma_cross.sma_cross import SmaCross
+	from strategies.mean_reversal.rsi_oscillator.rsi_oscillator import RsiOscillator
+
+	return [
+		(MinMax, {'lowest_length': range(2, 8), 'highest_length': range(2, 8), 'atr_length': [10, 20]}),
+		(MaxMin, {'highest_length': range(10, 40, 5), 'lowest_length': range(5, 20, 3), 'atr_length': [14, 20]}),
+		(SmaCross, {'n1': range(5, 30, 3), 'n2': range(20, 80, 6)}),
+		(RsiOscillator, {'rsi_len': range(5, 30, 3), 'upper_bound': [65, 70, 75], 'lower_bound': [25, 30, 35]}),
+	]
+
+
+def same_stats(reference, stats):
+	# every statistic of compute_stats, the timestamps and durations included
+	for key in reference.index:
+		if key.startswith('_'):
+			continue
+
+		expected, value = reference[key], stats[key]
+		if isinstance(expected, (pd.Timestamp, pd.Timedelta)):
+			if expected != value:
+				return False
+		elif not np.isclose(expected, value, rtol=1e-9, equal_nan=True):
+			return False
+
+	return True
+
+
+def check_parity(data, strategy, params):
+	# trade for trade comparison of VectorizedBacktest.run against Backtest.run
+	failures = 0
+
+	for settings in SETTINGS:
+		reference = Backtest(data, strategy, **settings).run(**params)
+		stats = VectorizedBacktest(data, strategy, **settings).run(**params)
+
+		expected = reference._trades[TRADE_COLUMNS].to_numpy(dtype=float)
+		trades = stats._trades[TRADE_COLUMNS].to_numpy(dtype=float)
+
+		same_trades = expected.shape == trades.shape and np.allclose(expected, trades, rtol=1e-12, atol=1e-9)
+		same_equity = np.allclose(reference._equity_curve['Equity'], stats._equity_curve['Equity'], rtol=1e-12)
+
+		if not (same_trades and same_equity and same_stats(reference, stats)):
+			failures += 1
+			print(f"  MISMATCH {strategy.__name__}{params} {settings}: {len(expected)} trades expected, {len(trades)} found")
+
+	return failures
+
+
+def timed(function, **kwargs):
+	begin = time.perf_counter()
+	result = function(**kwargs)
+
+	return time.perf_counter() - begin, result
+
+
+def run(ticker='SPY'):
+	from helpers.functions import DATA_DIR, CsvDirectoryProvider
+
+	warnings.filterwarnings('ignore')
+	data = CsvDirectoryProvider(DATA_DIR).get_ohlc_data(ticker, '2000-01-01', '2024-01-01', '1d')
+	print(f"{ticker}: {len(data)} candles, {len(FAST_STATS)} statistics computed without compute_stats")
+
+	failures = 0
+	for strategy, grid in strategy_grids():
+		# parity on the default parameters and on the first and last combination of the grid
+		first = {name: values[0] for name, values in grid.items()}
+		last = {name: values[-1] for name, values in grid.items()}
+
+		for params in [{}, first, last]:
+			failures += check_parity(data, strategy, params)
+
+		n_runs = int(np.prod([len(values) for values in grid.values()]))
+		reference_time, reference = timed(Backtest(data, strategy).optimize, maximize='SQN', **grid)
+		elapsed, stats = timed(VectorizedBacktest(data, strategy).optimize, maximize='SQN', **grid)
+
+		same = np.isclose(reference['SQN'], stats['SQN'], equal_nan=True)
+		print(
+			f"  {strategy.__name__ + ' optimize':<24} {n_runs:4d} runs  Backtest {reference_time:7.2f} s  "
+			f"vectorized {elapsed:6.3f} s  ({reference_time / elapsed:6.1f}x, {'same best' if same else 'MISMATCH'})"
+		)
+		failures += not same
+
+	print('parity: ' + ('ok' if not failures else f'{failures} mismatches'))
+
+	return failures
+
+
+if __name__ == "__main__":
+	sys.exit(1 if run(sys.argv[1] if len(sys.argv) > 1 else 'SPY') else 0)
@@ -0,0 +1,108 @@
+import math
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+
+# Structured event log of the backtrader strategies. Orders, fills, cancellations and closed trades are appended to
+# preallocated numpy columns instead of being formatted and printed one line at a time, and written out once, at the
+# end of the run. Strategies keep it as None when logging is off, so that every event costs a single test.
+
+EVENTS = ['order', 'fill', 'cancel', 'trade', 'note']
+ORDER, FILL, CANCEL, TRADE, NOTE = range(len(EVENTS))
+
+COLUMNS = {
+	'time': np.float64,        # backtrader date number of the candle
+	'event': np.int8,
+	'ref': np.int64,           # order or trade reference
+	'size': np.float64,        # signed: negative for sells
+	'price': np.float64,
+	'value': np.float64,
+	'commission': np.float64,
+	'pnl': np.float64,         # gross profit of closed trades
+	'note': np.int32,          # index in notes, -1 for none
+}
+
+
+class EventRecorder:
+	def __init__(self, capacity=1024):
+		self._columns = {name: np.empty(capacity, dtype) for name, dtype in COLUMNS.items()}
+		self._size = 0
+
+		# distinct notes, stored once and referenced by index
+		self._notes = {}
+
+	def __len__(self):
+		return self._size
+
+	def _grow(self):
+		for name, values in self._columns.items():
+			grown = np.empty(2 * len(values), values.dtype)
+			grown[:len(values)] = values
+			self._columns[name] = grown
+
+	def record(self, time, event, ref=-1, size=math.nan, price=math.nan, value=math.nan, commission=math.nan,
+			   pnl=math.nan, note=None):
+		if self._size == len(self._columns['time']):
+			self._grow()
+
+		row = self._size
+		columns = self._columns
+		columns['time'][row] = time
+		columns['event'][row] = event
+		columns['ref'][row] = ref
+		columns['size'][row] = size
+		columns['price'][row] = price
+		columns['value'][row] = value
+		columns['commission'][row] = commission
+		columns['pnl'][row] = pnl
+		columns['note'][row] = -1 if note is None else self._notes.setdefault(note, len(self._notes))
+
+		self._size += 1
+
+	def order(self, time, order, note=None):
+		# order created by the strategy
+		size = order.created.size if order.isbuy() else -abs(order.created.size)
+		self.record(time, ORDER, order.ref, size, order.created.price, note=note)
+
+	def notify_order(self, time, order):
+		# order notification of the broker: fills and cancellations are recorded, the other statuses are skipped
+		if order.status == order.Completed:
+			executed = order.executed
+			self.record(time, FILL, order.ref, executed.size, executed.price, executed.value, executed.comm)
+		elif order.status in [order.Canceled, order.Margin, order.Rejected, order.Expired]:
+			self.record(time, CANCEL, order.ref, note=order.getstatusname())
+
+	def notify_trade(self, time, trade):
+		if trade.isclosed:
+			self.record(time, TRADE, trade.ref, price=trade.price, commission=trade.commission, pnl=trade.pnl)
+
+	def note(self, time, note):
+		self.record(time, NOTE, note=note)
+
+	def frame(self):
+		columns = {name: values[:self._size] for name, values in self._columns.items()}
+		notes = np.array([*self._notes, None], dtype=object)
+
+		return pd.DataFrame({
+			'time': [bt.num2date(time) for time in columns['time']],
+			'event': pd.Categorical.from_codes(columns['event'], EVENTS),
+			**{name: columns[name] for name in ['ref', 'size', 'price', 'value', 'commission', 'pnl']},
+			'note': notes[columns['note']],
+		})
+
+	def flush(self, path=None):
+		"""
+		Write the events to path, a .parquet or .csv file, or print them when no path is given.
+		"""
+		frame = self.frame()
+
+		if path is None:
+			print(frame.to_string(index=False))
+		elif path.endswith('.parquet'):
+			frame.to_parquet(path, index=False)
+		elif path.endswith('.csv'):
+			frame.to_csv(path, index=False)
+		else:
+			raise Exception(f"Unsupported event log format: {path}. Use a .parquet or .csv file")
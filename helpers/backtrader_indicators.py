@@ -0,0 +1,28 @@
+from array import array
+
+import backtrader as bt
+import numpy as np
+
+from helpers import kernels
+
+
+# Indicators of "indicators.py" for the backtrader strategies. With runonce (the cerebro default) they are computed for
+# the whole feed at once by the same kernels as the backtesting.py strategies, so that next() only reads a precomputed
+# value per bar.
+
+
+class Streak(bt.Indicator):
+	"""
+	Number of consecutive bars, up to the current one, where the data (a condition such as data.low > sma) holds, 0
+	where it does not. Replaces lookback scans such as all(low[-i] > sma[-i] for i in range(n)) by streak[0] >= n.
+	"""
+	lines = ('streak',)
+	plotinfo = dict(plot=False)
+
+	def next(self):
+		previous = self.lines.streak[-1] if len(self) > 1 else 0
+		self.lines.streak[0] = (0 if np.isnan(previous) else previous) + 1 if self.data[0] > 0 else 0
+
+	def once(self, start, end):
+		condition = np.asarray(self.data.array[:end]) > 0
+		self.lines.streak.array[start:end] = array('d', kernels.streak(condition)[start:end])
@@ -0,0 +1,221 @@
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+from array import array
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+
+# Parameter sweeps of the backtrader strategies over a process pool. The feeds are parsed once, in the parent process,
+# and handed to every worker once by the pool initializer, where ArrayFeed preloads them column by column. Each task
+# runs cerebro.optstrategy over a slice of the grid with preload and runonce on, and every strategy is reduced to a row
+# of metrics as soon as it finishes, so neither the workers nor the parent keep strategy objects around.
+#
+#     rows = run_sweep(BBandRsi, {'bbands_stddev': [2.0, 2.5], 'rsi_upper_limit': range(50, 81, 10)}, data)
+
+# metrics of a row, named as the statistics of backtesting.py
+METRICS = ['Equity Final [$]', 'Return [%]', 'Sharpe Ratio', 'Max. Drawdown [%]', 'SQN', '# Trades', 'Win Rate [%]']
+
+# feeds and broker settings of the worker processes, set by _init_worker
+_feeds = {}
+_settings = {}
+
+
+class ArrayFeed(bt.feed.DataBase):
+	"""
+	Feed of a pandas OHLCV frame (Open, High, Low, Close and Volume columns, datetime index). On preload its lines are
+	filled a whole column at a time, instead of cell by cell as bt.feeds.PandasData does, which otherwise takes as long
+	as the backtest itself.
+	"""
+	COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+	def start(self):
+		super().start()
+
+		frame = self.p.dataname
+		index = frame.index.to_pydatetime()
+
+		# date2num of every candle, as the bar by bar loading would set it
+		days = (frame.index - frame.index[0]).total_seconds().to_numpy() / 86_400 if len(frame) else np.empty(0)
+		self._columns = {'datetime': bt.date2num(index[0]) + days if len(frame) else days}
+		self._columns |= {line: frame[column].to_numpy(dtype=float) for line, column in self.COLUMNS.items()}
+		self._columns['openinterest'] = np.zeros(len(frame))
+		self._row = -1
+
+	def _load(self):
+		self._row += 1
+
+		if self._row >= len(self.p.dataname):
+			return False
+
+		for line, values in self._columns.items():
+			getattr(self.lines, line)[0] = values[self._row]
+
+		return True
+
+	def preload(self):
+		for line, values in self._columns.items():
+			getattr(self.lines, line).array.extend(array('d', values))
+
+		# nothing left for _load()
+		self._row = len(self.p.dataname)
+		self.home()
+
+
+class _FinalValue(bt.Analyzer):
+	# broker value at the end of the run, which the optreturn results do not keep
+	def stop(self):
+		self.rets['value'] = self.strategy.broker.getvalue()
+
+
+def _iterize(values):
+	# grid values as optstrategy takes them: strings and scalars are a single value
+	if isinstance(values, str) or not hasattr(values, '__iter__'):
+		return [values]
+
+	return list(values)
+
+
+def split_grid(grid, n_slices):
+	# split the grid along its longest parameter into at most n_slices grids, whose products cover the original one
+	grid = {param: _iterize(values) for param, values in grid.items()}
+
+	if not grid:
+		return [grid]
+
+	param = max(grid, key=lambda name: len(grid[name]))
+	values = grid[param]
+	n_slices = max(1, min(n_slices, len(values)))
+	bounds = [round(k * len(values) / n_slices) for k in range(n_slices + 1)]
+
+	return [grid | {param: values[start:end]} for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _metrics_row(result, params, cash):
+	# compact row of the swept parameters and the metrics of one optreturn result
+	analyzers = result.analyzers
+	trades = analyzers.trades.get_analysis()
+	n_closed = trades.get('total', {}).get('closed', 0)
+	value = analyzers.value.get_analysis()['value']
+	sharpe = analyzers.sharpe.get_analysis().get('sharperatio')
+
+	metrics = {
+		'Equity Final [$]': value,
+		'Return [%]': 100 * (value / cash - 1),
+		'Sharpe Ratio': math.nan if sharpe is None else sharpe,
+		'Max. Drawdown [%]': analyzers.drawdown.get_analysis()['max']['drawdown'],
+		'SQN': analyzers.sqn.get_analysis()['sqn'],
+		'# Trades': n_closed,
+		'Win Rate [%]': 100 * trades['won']['total'] / n_closed if n_closed else math.nan,
+	}
+
+	return {param: getattr(result.params, param) for param in params} | metrics
+
+
+def _cerebro(feeds, settings):
+	cerebro = bt.Cerebro(stdstats=False, preload=True, runonce=True, optreturn=True, maxcpus=1)
+
+	for name, frame in feeds.items():
+		cerebro.adddata(ArrayFeed(dataname=frame), name=name)
+
+	cerebro.broker.set_cash(settings['cash'])
+	cerebro.broker.setcommission(commission=settings['commission'])
+
+	cerebro.addanalyzer(_FinalValue, _name='value')
+	cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+	cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe', riskfreerate=0.0)
+	cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+	cerebro.addanalyzer(bt.analyzers.SQN, _name='sqn')
+
+	return cerebro
+
+
+def _init_worker(feeds, settings):
+	_feeds.clear()
+	_feeds.update(feeds)
+	_settings.clear()
+	_settings.update(settings)
+
+
+def _run_grid(task):
+	strategy, grid = task
+	rows = []
+
+	cerebro = _cerebro(_feeds, _settings)
+	cerebro.optstrategy(strategy, **grid)
+	cerebro.optcallback(lambda results: rows.extend(
+		_metrics_row(result, grid, _settings['cash']) for result in results
+	))
+
+	# the strategies print their own logs, which are of no use in a sweep
+	with contextlib.redirect_stdout(io.StringIO()) if _settings['quiet'] else contextlib.nullcontext():
+		cerebro.run()
+
+	return rows
+
+
+def run_sweep(strategy, grid, data, processes=None, cash=10_000, commission=.0, quiet=True, on_rows=None):
+	"""
+	Run the backtrader strategy for every combination of the grid (parameter: values, as for cerebro.optstrategy), on
+	data, a pandas OHLCV frame or a dict of them by feed name. Returns a frame with one row per combination, with the
+	parameters of the strategy and METRICS as columns, in the order the runs finished. on_rows, when given, is called
+	with the rows of every finished slice of the grid.
+	"""
+	feeds = data if isinstance(data, dict) else {'data': data}
+	settings = {'cash': cash, 'commission': commission, 'quiet': quiet}
+	processes = processes or os.cpu_count()
+
+	# a few slices per process, so that the slowest ones do not leave the others idle
+	tasks = [(strategy, sub_grid) for sub_grid in split_grid(grid, 4 * processes)]
+	rows = []
+
+	def collect(task_rows):
+		rows.extend(task_rows)
+		if on_rows is not None:
+			on_rows(task_rows)
+
+	if processes == 1 or len(tasks) == 1:
+		_init_worker(feeds, settings)
+		for task in tasks:
+			collect(_run_grid(task))
+	else:
+		with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(feeds, settings)) as pool:
+			for task_rows in pool.imap_unordered(_run_grid, tasks):
+				collect(task_rows)
+
+	return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+	import sys
+	import time
+
+	from helpers.functions import DATA_DIR, CsvDirectoryProvider
+	from strategies_backtrader.mean_reversal.bband_rsi import BBandRsi
+
+	# python -m helpers.backtrader_sweep [ticker] [processes]
+	ticker = sys.argv[1] if len(sys.argv) > 1 else 'BTC'
+	n_processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+	ohlc_data = CsvDirectoryProvider(DATA_DIR).get_ohlc_data(ticker, '2014-01-01', '2023-12-31', '1d')
+
+	start = time.perf_counter()
+	results = run_sweep(
+		BBandRsi,
+		{
+			'bbands_stddev': [1.5, 1.75, 2.0, 2.25, 2.50, 2.75],
+			'rsi_upper_limit': range(50, 81, 10),
+			'do_logging': False
+		},
+		ohlc_data,
+		processes=n_processes,
+		cash=100_000,
+		commission=0.001
+	)
+
+	print(results.sort_values('Return [%]', ascending=False).to_string(index=False))
+	print(f"\n{len(results)} runs in {time.perf_counter() - start:.2f} s")
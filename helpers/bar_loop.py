@@ -0,0 +1,444 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from helpers.jit import compiled, jitable
+from helpers.vectorized import TRADE_COLUMNS, Simulation
+
+
+# Bar by bar backend for strategies whose next() keeps state that does not fit in signal arrays (counters, order
+# expiry, prices remembered between candles). The strategy provides a step function with the logic of next() over
+# plain arrays, and the orders it places are filled by a port of backtesting's _Broker (market, limit and stop orders,
+# SL/TP orders, trade.close() and position.close(), FIFO closing of opposite trades, trade_on_close, margin and the
+# out of money stop). Both run compiled by numba when it is available, and in python otherwise.
+#
+# The step function is called after the orders of every candle i are processed, as
+#
+#   step(i, open_, high, low, close, times, indicators, params, state, n_orders, n_trades, trade_size, trade_entry_bar,
+#        actions)
+#
+# where times are the candle times in nanoseconds, indicators a 2D array with the indicator values of candle i in
+# column i (indexed as indicators[row, i], which numba compiles better than indicators[row][i]), params the strategy
+# parameters and state an array the step function keeps its variables in. n_orders is the length of the order queue
+# (self.orders), n_trades the number of open trades, and trade_size and trade_entry_bar describe the last one
+# (self.trades[-1]). The orders of the candle are written in actions, indexed by:
+
+CANCEL = 0          # number of orders cancelled from the front of the queue (self.orders[0].cancel())
+CLOSE_TRADES = 1    # CLOSE_LAST_TRADE (self.trades[-1].close()) or CLOSE_POSITION (self.position.close())
+SIZE = 2            # size of a new order (buy when positive, sell when negative, none when 0)
+LIMIT = 3           # limit, stop, sl and tp prices of the new order, NaN (or 0) when not set
+STOP = 4
+SL = 5
+TP = 6
+N_ACTIONS = 7
+
+CLOSE_LAST_TRADE = 1
+CLOSE_POSITION = 2
+
+# rows of the order queue, the same as the actions of the new order, and its columns are the order slots
+KIND = 0            # ENTRY, CLOSE, STOP_LOSS or TAKE_PROFIT, -1 for a free slot
+TRADE = 1           # row of the trade of the SL/TP and closing orders
+RANK = 7            # position in the queue
+N_ORDER_ROWS = 8
+
+ENTRY = 0
+CLOSE = 1
+STOP_LOSS = 2
+TAKE_PROFIT = 3
+
+# rows of the trades (TRADE_COLUMNS), and scalars of the account
+(
+	TRADE_SIZE, ENTRY_PRICE, ENTRY_BAR, TRADE_SL, TRADE_TP, OPENED_AT, EXIT_PRICE, EXIT_BAR, CLOSED_AT, SEQUENCE
+) = range(len(TRADE_COLUMNS))
+CASH, N_TRADES, N_OPEN, N_CLOSED, FRONT, BACK = range(6)
+
+# status returned by _bar_loop, besides the candle of an invalid order
+FINISHED = -1
+FULL = -2
+
+
+@jitable
+def _queue(orders, slots):
+	# slots of the orders, in the order of the queue (insertion sort, as there are only a few orders)
+	m = 0
+	for slot in range(orders.shape[1]):
+		if orders[KIND, slot] >= 0:
+			position = m
+			while position > 0 and orders[RANK, slots[position - 1]] > orders[RANK, slot]:
+				slots[position] = slots[position - 1]
+				position -= 1
+			slots[position] = slot
+			m += 1
+
+	return m
+
+
+@jitable
+def _add_order(orders, kind, size, limit, stop, sl, tp, trade, rank):
+	# puts the order in a free slot of the queue, the rank giving its position; returns False when the queue is full
+	for slot in range(orders.shape[1]):
+		if orders[KIND, slot] < 0:
+			orders[KIND, slot] = kind
+			orders[TRADE, slot] = trade
+			orders[SIZE, slot] = size
+			orders[LIMIT, slot] = limit
+			orders[STOP, slot] = stop
+			orders[SL, slot] = sl
+			orders[TP, slot] = tp
+			orders[RANK, slot] = rank
+			return True
+
+	return False
+
+
+@jitable
+def _close_trade(trades, orders, account, row, price, time_index, candle):
+	# _Broker._close_trade: the trade leaves the open ones with its SL/TP orders, and its profit goes to the cash
+	trades[EXIT_PRICE, row] = price
+	trades[EXIT_BAR, row] = time_index
+	trades[CLOSED_AT, row] = candle
+	trades[SEQUENCE, row] = account[N_CLOSED]
+	account[N_CLOSED] += 1
+	account[CASH] += trades[TRADE_SIZE, row] * (price - trades[ENTRY_PRICE, row])
+
+	for slot in range(orders.shape[1]):
+		if orders[TRADE, slot] == row and (orders[KIND, slot] == STOP_LOSS or orders[KIND, slot] == TAKE_PROFIT):
+			orders[KIND, slot] = -1
+
+
+@jitable
+def _equity(trades, open_rows, account, price):
+	profit = 0.0
+	for o in range(int(account[N_OPEN])):
+		row = open_rows[o]
+		if not trades[CLOSED_AT, row] >= 0:
+			profit += trades[TRADE_SIZE, row] * (price - trades[ENTRY_PRICE, row])
+
+	return account[CASH] + profit
+
+
+@jitable
+def _margin_available(trades, open_rows, account, price, leverage):
+	margin_used = 0.0
+	for o in range(int(account[N_OPEN])):
+		row = open_rows[o]
+		if not trades[CLOSED_AT, row] >= 0:
+			margin_used += abs(trades[TRADE_SIZE, row]) * price / leverage
+
+	return max(0.0, _equity(trades, open_rows, account, price) - margin_used)
+
+
+@jitable
+def _process_orders(
+		i, open_, high, low, close, trade_on_close, commission, leverage, account, trades, open_rows, orders, slots, ranks
+):
+	# _Broker._process_orders on candle i. Returns False when the trades or the orders arrays are full.
+	reprocess = True
+	while reprocess:
+		reprocess = False
+
+		# the orders put in the queue while it is processed wait for the next pass
+		m = _queue(orders, slots)
+		for k in range(m):
+			ranks[k] = orders[RANK, slots[k]]
+
+		for k in range(m):
+			slot = slots[k]
+			if orders[KIND, slot] < 0 or orders[RANK, slot] != ranks[k]:
+				continue
+
+			is_long = orders[SIZE, slot] > 0
+
+			# a stop order becomes a market or limit order when its stop price is reached
+			stop_price = orders[STOP, slot]
+			if stop_price == stop_price:
+				if not (high[i] > stop_price if is_long else low[i] < stop_price):
+					continue
+				orders[STOP, slot] = np.nan
+
+			limit = orders[LIMIT, slot]
+			if limit == limit:
+				is_limit_hit = low[i] < limit if is_long else high[i] > limit
+				is_limit_hit_before_stop = is_limit_hit and (limit < stop_price if is_long else limit > stop_price)
+				if not is_limit_hit or is_limit_hit_before_stop:
+					continue
+
+				reference = stop_price if stop_price == stop_price else open_[i]
+				price = min(reference, limit) if is_long else max(reference, limit)
+			else:
+				price = close[i - 1] if trade_on_close else open_[i]
+				if stop_price == stop_price:
+					price = max(price, stop_price) if is_long else min(price, stop_price)
+
+			is_market_order = not limit == limit and not stop_price == stop_price
+			time_index = i - 1 if is_market_order and trade_on_close else i
+
+			# SL/TP and closing orders close the whole trade they belong to
+			if orders[KIND, slot] != ENTRY:
+				row = int(orders[TRADE, slot])
+				if not trades[CLOSED_AT, row] >= 0:
+					_close_trade(trades, orders, account, row, price, time_index, i)
+				orders[KIND, slot] = -1
+				continue
+
+			adjusted_price = price * (1 + math.copysign(commission, orders[SIZE, slot]))
+
+			size = orders[SIZE, slot]
+			if -1 < size < 1:
+				size = math.copysign(
+					int((_margin_available(trades, open_rows, account, close[i], leverage) * leverage * abs(size)) // adjusted_price),
+					size
+				)
+				if size == 0:
+					orders[KIND, slot] = -1
+					continue
+			need_size = int(size)
+
+			# opposite trades are closed, or reduced, first in FIFO order
+			for o in range(int(account[N_OPEN])):
+				row = open_rows[o]
+				if trades[CLOSED_AT, row] >= 0 or (trades[TRADE_SIZE, row] > 0) == is_long:
+					continue
+
+				if abs(need_size) >= abs(trades[TRADE_SIZE, row]):
+					_close_trade(trades, orders, account, row, price, time_index, i)
+					need_size += int(trades[TRADE_SIZE, row])
+				else:
+					# the reduced part is closed as a copy of the trade
+					copy = int(account[N_TRADES])
+					if copy >= trades.shape[1]:
+						return False
+					account[N_TRADES] += 1
+
+					trades[TRADE_SIZE, row] += need_size
+					for column in range(trades.shape[0]):
+						trades[column, copy] = trades[column, row]
+					trades[TRADE_SIZE, copy] = -need_size
+					_close_trade(trades, orders, account, copy, price, time_index, i)
+					need_size = 0
+
+				if need_size == 0:
+					break
+
+			# not enough liquidity to cover for the order
+			if abs(need_size) * adjusted_price > _margin_available(trades, open_rows, account, close[i], leverage) * leverage:
+				orders[KIND, slot] = -1
+				continue
+
+			if need_size:
+				row = int(account[N_TRADES])
+				if row >= trades.shape[1]:
+					return False
+				account[N_TRADES] += 1
+
+				sl, tp = orders[SL, slot], orders[TP, slot]
+				for column in range(trades.shape[0]):
+					trades[column, row] = np.nan
+				trades[TRADE_SIZE, row] = need_size
+				trades[ENTRY_PRICE, row] = adjusted_price
+				trades[ENTRY_BAR, row] = time_index
+				trades[TRADE_SL, row] = sl
+				trades[TRADE_TP, row] = tp
+				trades[OPENED_AT, row] = i
+				open_rows[int(account[N_OPEN])] = row
+				account[N_OPEN] += 1
+
+				# the SL order goes in front of the TP order, both in front of the queue
+				if tp == tp:
+					account[FRONT] -= 1
+					if not _add_order(orders, TAKE_PROFIT, -need_size, tp, np.nan, np.nan, np.nan, row, account[FRONT]):
+						return False
+				if sl == sl:
+					account[FRONT] -= 1
+					if not _add_order(orders, STOP_LOSS, -need_size, np.nan, sl, np.nan, np.nan, row, account[FRONT]):
+						return False
+
+				# the SL/TP orders of market entries are checked on the candle of the entry as well
+				if is_market_order and (sl == sl or tp == tp):
+					reprocess = True
+
+			orders[KIND, slot] = -1
+
+	# drop the closed trades from the open ones
+	kept = 0
+	for o in range(int(account[N_OPEN])):
+		row = open_rows[o]
+		if not trades[CLOSED_AT, row] >= 0:
+			open_rows[kept] = row
+			kept += 1
+	account[N_OPEN] = kept
+
+	return True
+
+
+@jitable
+def _apply_actions(i, close, commission, actions, account, trades, open_rows, orders, slots):
+	# orders of next() on candle i: cancellations from the front of the queue, closing orders, then the new order.
+	# Returns FINISHED, FULL when the orders array is full, or i when the new order is invalid.
+	for _ in range(int(actions[CANCEL])):
+		if _queue(orders, slots) == 0:
+			break
+		orders[KIND, slots[0]] = -1
+
+	n_open = int(account[N_OPEN])
+	first = 0 if actions[CLOSE_TRADES] == CLOSE_POSITION else n_open - 1
+	if actions[CLOSE_TRADES] == CLOSE_POSITION or actions[CLOSE_TRADES] == CLOSE_LAST_TRADE:
+		for o in range(max(first, 0), n_open):
+			row = open_rows[o]
+			account[FRONT] -= 1
+			if not _add_order(orders, CLOSE, -trades[TRADE_SIZE, row], np.nan, np.nan, np.nan, np.nan, row, account[FRONT]):
+				return FULL
+
+	size = actions[SIZE]
+	if size != 0:
+		# as in Strategy.buy() and Strategy.sell(), prices of 0 are not set
+		limit, stop, sl, tp = actions[LIMIT], actions[STOP], actions[SL], actions[TP]
+		limit = np.nan if limit == 0 else limit
+		stop = np.nan if stop == 0 else stop
+		sl = np.nan if sl == 0 else sl
+		tp = np.nan if tp == 0 else tp
+
+		# same validation as _Broker.new_order
+		price = limit if limit == limit else (stop if stop == stop else close[i] * (1 + math.copysign(commission, size)))
+		if (sl >= price or tp <= price) if size > 0 else (tp >= price or sl <= price):
+			return i
+
+		account[BACK] += 1
+		if not _add_order(orders, ENTRY, size, limit, stop, sl, tp, -1.0, account[BACK]):
+			return FULL
+
+	return FINISHED
+
+
+def _bar_loop(
+		step, open_, high, low, close, times, indicators, params, state, actions, start, trade_on_close, commission,
+		leverage, account, trades, open_rows, orders, slots, ranks, equity
+):
+	# Backtest.run from the candle start: orders processing, equity and next() on every candle, then the closing of the
+	# open trades and the processing of the last orders on the last candle. Returns FINISHED, FULL or the candle of an
+	# invalid order.
+	n = len(close)
+
+	for candle in range(start, n + 1):
+		final = candle == n
+		i = n - 1 if final else candle
+
+		if final:
+			# closing orders of the open trades, newest trade first in the queue
+			for o in range(int(account[N_OPEN])):
+				row = open_rows[o]
+				account[FRONT] -= 1
+				if not _add_order(orders, CLOSE, -trades[TRADE_SIZE, row], np.nan, np.nan, np.nan, np.nan, row, account[FRONT]):
+					return FULL
+
+		if not _process_orders(
+				i, open_, high, low, close, trade_on_close, commission, leverage, account, trades, open_rows, orders, slots, ranks
+		):
+			return FULL
+
+		equity[i] = _equity(trades, open_rows, account, close[i])
+
+		# out of money: Backtest.run closes the open trades at the close, skipping every other one as it removes them
+		# from the list it iterates, and stops
+		if equity[i] <= 0:
+			for o in range(0, int(account[N_OPEN]), 2):
+				_close_trade(trades, orders, account, open_rows[o], close[i], i, i)
+			for j in range(i, n):
+				equity[j] = 0.0
+			return FINISHED
+
+		if final:
+			return FINISHED
+
+		for a in range(N_ACTIONS):
+			actions[a] = 0.0
+
+		n_open = int(account[N_OPEN])
+		last = open_rows[n_open - 1] if n_open else 0
+		step(
+			i, open_, high, low, close, times, indicators, params, state, _queue(orders, slots), n_open,
+			trades[TRADE_SIZE, last] if n_open else 0.0, trades[ENTRY_BAR, last] if n_open else -1.0, actions
+		)
+
+		status = _apply_actions(i, close, commission, actions, account, trades, open_rows, orders, slots)
+		if status != FINISHED:
+			return status
+
+	return FINISHED
+
+
+def run_bar_loop(
+		data, step, indicators, params, state, start, *, cash=10_000, commission=.0, margin=1., trade_on_close=False,
+		jit=True, max_orders=16
+):
+	"""
+	Run the step function of a strategy on every candle of data from start on, with the orders filled as in
+	Backtest.run. indicators are the indicator arrays (rows of a 2D array, or a list of them), params the strategy
+	parameters as floats, and state the initial state of the step function. Returns a Simulation with the trades and
+	the equity curve.
+	"""
+	n = len(data)
+	ohlc = [data[column].to_numpy(dtype=np.float64) for column in ['Open', 'High', 'Low', 'Close']]
+	times = data.index.asi8 if isinstance(data.index, pd.DatetimeIndex) else np.arange(n, dtype=np.int64)
+
+	indicators = np.vstack([np.asarray(indicator, dtype=np.float64).reshape(-1, n) for indicator in indicators])
+	params = np.asarray(params, dtype=np.float64)
+	state = np.asarray(state, dtype=np.float64)
+
+	equity = np.full(n, np.nan)
+	if start >= n:
+		return Simulation({name: np.empty(0) for name in TRADE_COLUMNS}, ohlc[3], start, cash, equity=np.full(n, float(cash)))
+
+	loop = compiled(_bar_loop) if jit else None
+	step = compiled(step) if loop is not None else step
+
+	# the arrays are enlarged and the loop run again when they are too small
+	capacity = n // 8 + 16
+	status = FULL
+	while status == FULL:
+		account = np.array([cash, 0, 0, 0, 0, 0], dtype=np.float64)
+		trades = np.full((len(TRADE_COLUMNS), capacity), np.nan)
+		open_rows = np.zeros(capacity, dtype=np.int64)
+		orders = np.full((N_ORDER_ROWS, max_orders), np.nan)
+		orders[KIND] = -1
+		slots = np.zeros(max_orders, dtype=np.int64)
+		ranks = np.zeros(max_orders)
+		actions = np.zeros(N_ACTIONS)
+		run_state = state.copy()
+
+		settings = [int(start), bool(trade_on_close), float(commission), 1 / margin]
+
+		if loop is not None:
+			status = loop(
+				step, *ohlc, times, indicators, params, run_state, actions, *settings, account, trades, open_rows, orders,
+				slots, ranks, equity
+			)
+		else:
+			# the 2D arrays stay arrays, as they are indexed by row and column
+			lists = [array.tolist() for array in (*ohlc, times)]
+			account, open_rows, slots, ranks, actions, run_state, equity_list = (
+				array.tolist() for array in (account, open_rows, slots, ranks, actions, run_state, equity)
+			)
+
+			status = _bar_loop(
+				step, *lists, indicators, params.tolist(), run_state, actions, *settings, account, trades,
+				open_rows, orders, slots, ranks, equity_list
+			)
+
+			equity = np.array(equity_list, dtype=np.float64)
+			account = np.array(account)
+
+		if status == FULL:
+			capacity *= 2
+			max_orders *= 2
+
+	if status >= 0:
+		raise ValueError(f"Invalid order placed by the strategy on candle {status} ({data.index[status]})")
+
+	columns = {name: column[:int(account[N_TRADES])] for name, column in zip(TRADE_COLUMNS, trades)}
+
+	# the candles before the first call of next() have the equity of the first one
+	equity[:start] = equity[start]
+
+	return Simulation(columns, ohlc[3], start, cash, equity=equity)
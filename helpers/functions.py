@@ -1,8 +1,27 @@
-import yfinance as yf
+import os
+import re
+import json
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+INTRADAY_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"]
+
+# csv files bundled with the repo and default location of the on-disk ohlc cache (data/cache)
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+def download_ohlc(ticker, start_date, end_date, interval, auto_adjust=True):
+	# yfinance is slow to import, so it is only loaded when data is actually downloaded
+	import yfinance as yf
 
-def get_ohlc_data(ticker, start_date, end_date, interval, auto_adjust=True):
 	# Fetch the historical data
 	data = yf.download(
 		ticker,
@@ -17,7 +36,7 @@ def get_ohlc_data(ticker, start_date, end_date, interval, auto_adjust=True):
 	data.reset_index(inplace=True)
 
 	# Set Datetime/Date column as df index
-	if interval in ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"]:
+	if interval in INTRADAY_INTERVALS:
 		datetime_column = "Datetime"
 	else:
 		datetime_column = "Date"
@@ -27,3 +46,384 @@ def get_ohlc_data(ticker, start_date, end_date, interval, auto_adjust=True):
 	data.index.name = None
 
 	return data
+
+
+class OhlcCache:
+	"""
+	On-disk Parquet cache of OHLC data, keyed by ticker, interval and adjustment mode.
+
+	Each key is stored as one Parquet file plus a small json file listing the date ranges already fetched from the
+	source. Only the parts of a request that are not covered yet are fetched, and they are merged into the stored file.
+	Ranges whose fetch returned no rows are not covered, so they are fetched again on the next request.
+	The fetch function must have the same signature and output format as download_ohlc, so a local stub can replace
+	Yahoo Finance in tests.
+	"""
+
+	def __init__(self, cache_dir=CACHE_DIR, fetch=download_ohlc):
+		self.cache_dir = cache_dir
+		self.fetch = fetch
+
+	def _path(self, ticker, interval, auto_adjust):
+		# tickers such as "^BVSP" or "ABEV3.SA" are not safe file names
+		safe_ticker = re.sub(r'[^A-Za-z0-9_-]', '_', ticker)
+		mode = 'adj' if auto_adjust else 'raw'
+
+		return os.path.join(self.cache_dir, f"{safe_ticker}_{interval}_{mode}")
+
+	@staticmethod
+	def _missing_ranges(start, end, covered):
+		# subtract the already covered [start, end) ranges from the requested one
+		missing = []
+		cursor = start
+
+		for covered_start, covered_end in sorted(covered):
+			if covered_end <= cursor or covered_start >= end:
+				continue
+			if covered_start > cursor:
+				missing.append((cursor, covered_start))
+			cursor = max(cursor, covered_end)
+
+			if cursor >= end:
+				break
+
+		if cursor < end:
+			missing.append((cursor, end))
+
+		return missing
+
+	@staticmethod
+	def _merge_ranges(ranges):
+		merged = []
+
+		for start, end in sorted(ranges):
+			if merged and start <= merged[-1][1]:
+				merged[-1][1] = max(merged[-1][1], end)
+			else:
+				merged.append([start, end])
+
+		return merged
+
+	def load(self, ticker, interval, auto_adjust=True):
+		path = self._path(ticker, interval, auto_adjust)
+
+		if not os.path.exists(path + '.parquet'):
+			return None, []
+
+		with open(path + '.json') as file:
+			covered = [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in json.load(file)['covered']]
+
+		return pd.read_parquet(path + '.parquet'), covered
+
+	def save(self, ticker, interval, auto_adjust, data, covered):
+		path = self._path(ticker, interval, auto_adjust)
+		os.makedirs(self.cache_dir, exist_ok=True)
+
+		# written to temporary files first, so a crash never leaves a half written file in place
+		data.to_parquet(path + '.parquet.tmp')
+		os.replace(path + '.parquet.tmp', path + '.parquet')
+
+		with open(path + '.json.tmp', 'w') as file:
+			json.dump({'covered': [[start.isoformat(), end.isoformat()] for start, end in covered]}, file)
+		os.replace(path + '.json.tmp', path + '.json')
+
+	def get(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		start = pd.Timestamp(start_date)
+		end = pd.Timestamp(end_date)
+
+		data, covered = self.load(ticker, interval, auto_adjust)
+		missing = self._missing_ranges(start, end, covered)
+
+		if missing:
+			# fetch only the gaps and merge them into the stored data
+			chunks = [self.fetch(ticker, gap_start, gap_end, interval, auto_adjust) for gap_start, gap_end in missing]
+
+			# yfinance returns an empty frame when a download fails, so empty gaps are fetched again on the next call
+			fetched = [gap for gap, chunk in zip(missing, chunks) if len(chunk)]
+
+			if data is not None:
+				chunks.insert(0, data)
+
+			data = pd.concat(chunks)
+			data = data[~data.index.duplicated(keep='last')].sort_index()
+
+			# days after today may still receive data, so they are never marked as covered
+			today = pd.Timestamp.now().normalize()
+			fetched = [(gap_start, min(gap_end, today)) for gap_start, gap_end in fetched if gap_start < today]
+
+			if fetched:
+				covered = self._merge_ranges(covered + fetched)
+				self.save(ticker, interval, auto_adjust, data, covered)
+
+		# intraday indexes are timezone aware, while the requested dates usually are not
+		if data.index.tz is not None and start.tz is None:
+			start = start.tz_localize(data.index.tz)
+			end = end.tz_localize(data.index.tz)
+
+		return data[(data.index >= start) & (data.index < end)]
+
+
+# cache shared by every get_ohlc_data call
+ohlc_cache = OhlcCache()
+
+
+class OhlcProvider:
+	"""
+	Source of OHLC data. Implementations return the same frame format as download_ohlc: a DatetimeIndex without name,
+	Open, High, Low, Close (plus Adj Close when not auto adjusted) and Volume columns, and no days without negotiations.
+	"""
+
+	def get_ohlc_data(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		raise NotImplementedError
+
+
+class YahooProvider(OhlcProvider):
+	""" Yahoo Finance data, read through an OhlcCache unless cache is None. """
+
+	def __init__(self, cache=ohlc_cache):
+		self.cache = cache
+
+	def get_ohlc_data(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		if self.cache is None:
+			return download_ohlc(ticker, start_date, end_date, interval, auto_adjust)
+
+		return self.cache.get(ticker, start_date, end_date, interval, auto_adjust)
+
+
+class CsvDirectoryProvider(OhlcProvider):
+	"""
+	Offline daily data read from a directory of Yahoo Finance csv files, such as the bundled data/ folder.
+
+	Each file is parsed once into typed numpy arrays, which are kept in an LRU cache keyed by file path and modification
+	time, so an edited file is parsed again on its next use.
+	"""
+
+	def __init__(self, data_dir=DATA_DIR, maxsize=16):
+		self.data_dir = data_dir
+		self.maxsize = maxsize
+		self._arrays = OrderedDict()
+		self._lock = threading.Lock()
+
+	def _csv_path(self, ticker):
+		# "ABEV3.SA" is stored as ABEV3.csv
+		for name in [ticker, ticker.split('.')[0]]:
+			path = os.path.join(self.data_dir, f"{name}.csv")
+
+			if os.path.exists(path):
+				return path
+
+		raise Exception(f"No csv file found for {ticker} in {self.data_dir}")
+
+	def _read(self, path):
+		key = (path, os.path.getmtime(path))
+
+		with self._lock:
+			if key in self._arrays:
+				self._arrays.move_to_end(key)
+				return self._arrays[key]
+
+		# yahoo csv files write missing days as "null"
+		frame = pd.read_csv(
+			path,
+			parse_dates=["Date"],
+			na_values="null",
+			dtype={column: "float64" for column in PRICE_COLUMNS + ["Adj Close", "Volume"]}
+		)
+		frame = frame.dropna().sort_values("Date").astype({"Volume": "int64"})
+
+		arrays = {column: frame[column].to_numpy() for column in frame.columns}
+
+		with self._lock:
+			# drop the entries of older versions of the same file before storing the new one
+			for cached_key in [cached_key for cached_key in self._arrays if cached_key[0] == path]:
+				del self._arrays[cached_key]
+
+			self._arrays[key] = arrays
+
+			if len(self._arrays) > self.maxsize:
+				self._arrays.popitem(last=False)
+
+		return arrays
+
+	def get_ohlc_data(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		if interval != "1d":
+			raise Exception(f"Only daily data is available offline, and not {interval}")
+
+		arrays = self._read(self._csv_path(ticker))
+
+		# slice the requested [start, end) window before building any frame
+		dates = arrays["Date"]
+		first, last = dates.searchsorted([pd.Timestamp(start_date).to_datetime64(), pd.Timestamp(end_date).to_datetime64()])
+
+		data = pd.DataFrame(
+			{column: values[first:last] for column, values in arrays.items() if column != "Date"},
+			index=pd.DatetimeIndex(dates[first:last])
+		)
+
+		if auto_adjust:
+			# same adjustment done by yfinance: scale OHLC by the adjusted close ratio
+			ratio = data["Adj Close"] / data["Close"]
+			data[PRICE_COLUMNS] = data[PRICE_COLUMNS].mul(ratio, axis=0)
+			data.drop(columns="Adj Close", inplace=True)
+
+		# remove days without negotiations
+		data = data[data.High != data.Low]
+
+		return data
+
+
+@functools.lru_cache(maxsize=None)
+def _csv_provider(data_dir):
+	# one provider per directory, so its parsed files are shared by every caller
+	return CsvDirectoryProvider(data_dir)
+
+
+def default_provider():
+	# setting OHLC_DATA_DIR makes every script read csv files from that directory instead of downloading data
+	data_dir = os.environ.get("OHLC_DATA_DIR")
+
+	if data_dir:
+		return _csv_provider(os.path.abspath(data_dir))
+
+	return YahooProvider()
+
+
+def compact_ohlc(data):
+	"""
+	Return a copy of an OHLCV frame (or panel) using float32 prices and the smallest of uint32/int32 that holds the
+	integer columns, such as Volume. Float volumes, such as the ones of an outer panel with missing days, stay float64:
+	float32 only holds integers exactly up to 2**24. The number of bytes saved is reported in the memory_saved entry of
+	the returned frame attrs.
+	"""
+	dtypes = {}
+
+	for column, dtype in data.dtypes.items():
+		field = column[-1] if isinstance(column, tuple) else column
+
+		if dtype.kind == 'f' and field != 'Volume':
+			dtypes[column] = np.float32
+		elif dtype.kind in 'iu':
+			values = data[column].to_numpy()
+
+			if not len(values) or values.min() >= 0 and values.max() <= np.iinfo(np.uint32).max:
+				dtypes[column] = np.uint32
+			elif values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+				dtypes[column] = np.int32
+
+	compact = data.astype(dtypes)
+	compact.attrs['memory_saved'] = int(data.memory_usage(deep=True).sum() - compact.memory_usage(deep=True).sum())
+
+	return compact
+
+
+def get_ohlc_data(
+		ticker, start_date, end_date, interval, auto_adjust=True, use_cache=True, provider=None, compact=False
+):
+	if provider is None:
+		provider = default_provider() if use_cache else YahooProvider(cache=None)
+
+	data = provider.get_ohlc_data(ticker, start_date, end_date, interval, auto_adjust)
+
+	# float32 prices, whose indicators are computed as float32 too (see helpers.indicators)
+	if compact:
+		data = compact_ohlc(data)
+
+	return data
+
+
+def get_ohlc_panel(
+		tickers, start_date, end_date, interval, auto_adjust=True, provider=None, how='inner', max_workers=8,
+		compact=False
+):
+	"""
+	Load several tickers concurrently and align them on a common calendar.
+
+	The tickers are retrieved in a pool of at most max_workers threads. how='inner' keeps only the dates traded by every
+	ticker and how='outer' keeps the union of dates, leaving NaN where a ticker has no data. A ticker that fails does not
+	abort the batch: the panel is built from the others and the exception is returned in the errors dict. With compact,
+	every ticker is converted with compact_ohlc as soon as it is loaded.
+
+	Returns the panel, with (ticker, field) MultiIndex columns, and the errors dict.
+	"""
+	if how not in ['inner', 'outer']:
+		raise Exception(f"Calendar alignment must be 'inner' or 'outer', and not {how}")
+
+	if provider is None:
+		provider = default_provider()
+
+	def load(ticker):
+		data = provider.get_ohlc_data(ticker, start_date, end_date, interval, auto_adjust)
+
+		# compact each ticker as soon as it is loaded, so the float64 frames are not all held at once
+		return compact_ohlc(data) if compact else data
+
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as executor:
+		futures = [executor.submit(load, ticker) for ticker in tickers]
+
+	frames = {}
+	errors = {}
+
+	for ticker, future in zip(tickers, futures):
+		try:
+			frames[ticker] = future.result()
+		except Exception as error:
+			errors[ticker] = error
+
+	if not frames:
+		return pd.DataFrame(columns=pd.MultiIndex.from_tuples([], names=[None, None])), errors
+
+	panel = pd.concat(frames, axis=1, join=how).sort_index()
+
+	if compact:
+		# the outer calendar turns integer volumes with missing days into float64, which compact_ohlc keeps as they are
+		panel.attrs['memory_saved'] = sum(frame.attrs['memory_saved'] for frame in frames.values())
+
+	return panel, errors
+
+
+def panel_to_array(panel, fields=None):
+	"""
+	Convert a panel from get_ohlc_panel to a (ticker x time x field) numpy array.
+
+	The array has the smallest float type that holds every selected column: the float32 prices of a compact panel stay
+	float32, while volumes make it float64, as float32 only holds integers exactly up to 2**24.
+
+	Returns the array together with the tickers, the dates and the fields of each axis.
+	"""
+	tickers = list(panel.columns.unique(0))
+
+	if fields is None:
+		fields = list(panel[tickers[0]].columns)
+
+	columns = pd.MultiIndex.from_product([tickers, fields])
+	dtype = np.result_type(np.float32, *panel.dtypes[panel.columns.isin(columns)])
+	values = panel.reindex(columns=columns).to_numpy(dtype=dtype)
+
+	# columns are ordered ticker by ticker, so (time, ticker * field) reshapes to (time, ticker, field)
+	array = values.reshape(len(panel), len(tickers), len(fields)).transpose(1, 0, 2)
+
+	return array, tickers, panel.index, fields
+
+
+def iter_ohlc_chunks(data, chunk_size, warmup=0, first=0, last=None):
+	"""
+	Yield the bars of data in chunks of chunk_size, from position first up to last (exclusive).
+
+	Each chunk is preceded by up to warmup bars of the previous chunk, enough to warm up the longest indicator lookback,
+	and is yielded as (frame, n_warmup). data can be a DataFrame or a memory-mapped series (see helpers.mmap_store),
+	which has its chunks read from disk only when they are yielded, keeping memory bounded for any history length.
+	"""
+	if chunk_size < 1:
+		raise Exception(f"Chunk size must be positive, and not {chunk_size}")
+
+	last = len(data) if last is None else last
+
+	for chunk_start in range(first, last, chunk_size):
+		begin = max(first, chunk_start - warmup)
+		end = min(chunk_start + chunk_size, last)
+
+		if isinstance(data, pd.DataFrame):
+			chunk = data.iloc[begin:end]
+		else:
+			chunk = data.frame(begin, end)
+
+		yield chunk, chunk_start - begin
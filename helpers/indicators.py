@@ -1,95 +1,217 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 
+from helpers import kernels
+
+
+class IndicatorCache:
+    """
+    Size-bounded LRU cache of indicator values, keyed by indicator function, fingerprint of the input arrays and
+    parameters.
+
+    Parameter sweeps build a new Strategy for every combination, which recomputes all its indicators in init(). With
+    the cache, an indicator whose inputs did not change (e.g. highest(High, 20) while only lowest_length is swept) is
+    computed once per process. Setting maxsize to 0 disables it.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._values[key] = value
+
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._values), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# cache shared by the indicators of this module
+indicator_cache = IndicatorCache()
+
+
+def indicator_cache_info():
+    return indicator_cache.info()
+
+
+def clear_indicator_cache():
+    indicator_cache.clear()
+
+
+def _fingerprint(value):
+    # arrays are identified by dtype, shape and a hash of their bytes, everything else by its own value
+    if isinstance(value, (np.ndarray, pd.Series, pd.DataFrame)):
+        array = np.ascontiguousarray(np.asarray(value))
+        return array.dtype.str, array.shape, hashlib.blake2b(array.data, digest_size=16).digest()
+
+    return value
+
+
+def memoized(indicator):
+    # Serve repeated calls of an indicator from indicator_cache. Copies are returned, so the cached values are never
+    # modified by the caller.
+    @wraps(indicator)
+    def wrapper(*args, **kwargs):
+        key = (
+            indicator.__qualname__,
+            tuple(_fingerprint(arg) for arg in args),
+            tuple((name, _fingerprint(value)) for name, value in sorted(kwargs.items()))
+        )
+
+        values = indicator_cache.get(key)
+
+        if values is None:
+            values = indicator(*args, **kwargs)
+            indicator_cache.put(key, values)
 
+        return values.copy()
+
+    return wrapper
+
+
+def _to_series(values):
+    # Convert to a float64 pandas series. float32 inputs (compact mode) are upcast, so that accumulations such as
+    # the EMA, RSI and rolling standard deviation keep full precision.
+    return pd.Series(values, dtype=np.float64)
+
+
+def _to_array(values):
+    # Contiguous float64 array for the kernels, upcast from float32 inputs (compact mode) for the same reason.
+    return kernels.as_array(values)
+
+
+def _like_input(result, values):
+    # Indicators of compact (float32) data are returned as float32 as well.
+    if getattr(values, 'dtype', None) == np.float32:
+        return result.astype(np.float32)
+
+    return result
+
+
+@memoized
 def local_sma(close, length):
     # Convert to pandas series.
-    close = pd.Series(close)
+    series = _to_series(close)
 
     # computing the simple moving average without using pandas-ta.
     # Used as an example for creating other custom indicators.
-    sma_values = close.rolling(length).mean()
+    sma_values = series.rolling(length).mean()
 
-    return sma_values
+    return _like_input(sma_values, close)
 
 
+@memoized
 def sma(close, length):
-    # Convert to pandas series. Necessary for error avoidance.
-    close = pd.Series(close)
-
-    # simple moving average values calculated by the imported function.
-    sma_values = ta.sma(close=close, length=length)
-
-    return sma_values
+    # simple moving average values calculated by the numpy kernel.
+    return _like_input(kernels.sma(_to_array(close), length), close)
 
 
+@memoized
 def rsi(close, length):
-    # Convert to pandas series. Necessary for error avoidance.
-    close = pd.Series(close)
+    # relative strength index values, with Wilder's smoothing as in pandas_ta.
+    return _like_input(kernels.rsi(_to_array(close), length), close)
 
-    # relative strength index values calculated by the imported function.
-    rsi_values = ta.rsi(close=close, length=length)
 
-    return rsi_values
+@memoized
+def ema(close, length):
+    # exponential moving average values, seeded with the simple average of the first candles as in pandas_ta.
+    return _like_input(kernels.ema(_to_array(close), length), close)
 
 
-def ema(close, length):
-    # Convert to pandas series. Necessary for error avoidance.
-    close = pd.Series(close)
+@memoized
+def bbands(close, length=20, std=2.0):
+    # Lower, mid and upper bands, respectively, as the rows of a single array.
+    return _like_input(kernels.bbands(_to_array(close), length, std), close)
+
 
-    # relative strength index values calculated by the imported function.
-    ema_values = ta.ema(close=close, length=length)
+@memoized
+def highest(price, length):
+    return _like_input(kernels.highest(_to_array(price), length), price)
 
-    return ema_values
 
+@memoized
+def lowest(price, length):
+    return _like_input(kernels.lowest(_to_array(price), length), price)
 
-def bbands(close, length=20, std=2.0):
-    # Convert to pandas series. Necessary for error avoidance.
-    close = pd.Series(close)
 
-    # Lower, mid and upper, respectively, being calculated by the imported bbands function.
-    bband_values = ta.bbands(close=close, length=length, std=std)
+@memoized
+def atr(high, low, close, length):
+    return _like_input(kernels.atr(_to_array(high), _to_array(low), _to_array(close), length), close)
 
-    return bband_values.iloc[:, :3]
 
+@memoized
+def sma_std(close, length, rolling_length):
+    # standard deviation of the simple moving average values.
+    return _like_input(kernels.sma_std(_to_array(close), length, rolling_length), close)
 
-def highest(price, length):
-    # Convert to pandas series. Necessary for error avoidance.
-    price = pd.Series(price)
 
-    return price.rolling(length).max()
+@memoized
+def dema(close, length):
+    # double exponential moving average values, as in pandas_ta.
+    return _like_input(kernels.dema(_to_array(close), length), close)
 
 
-def lowest(price, length):
-    # Convert to pandas series. Necessary for error avoidance.
-    price = pd.Series(price)
+@memoized
+def streak(condition):
+    # Number of consecutive candles, up to each one, where the boolean condition holds (0 where it does not), e.g. the
+    # candles of a trend regime: streak(low > sma(close, 200)) >= 6.
+    return kernels.streak(condition)
 
-    return price.rolling(length).min()
 
+@memoized
+def supertrend(high, low, close, length=7, multiplier=3.0):
+    # Supertrend line, direction (1 or -1), long and short lines, respectively, as the rows of a single array.
+    values = kernels.supertrend(_to_array(high), _to_array(low), _to_array(close), length, multiplier)
 
-def atr(high, low, close, length):
-    high = pd.Series(high)
-    low = pd.Series(low)
-    close = pd.Series(close)
+    return _like_input(values, close)
 
-    high_low = high - low
-    high_close = np.abs(high - close.shift())
-    low_close = np.abs(low - close.shift())
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = np.max(ranges, axis=1)
 
-    return true_range.rolling(length).mean()
+def highest_multi(price, lengths):
+    # Highest price for every length in lengths, as a (lengths x candles) array.
+    return kernels.highest_multi(price, lengths)
 
 
-def sma_std(close, length, rolling_length):
-    # Convert to pandas series. Necessary for error avoidance.
-    close = pd.Series(close)
+def lowest_multi(price, lengths):
+    # Lowest price for every length in lengths, as a (lengths x candles) array.
+    return kernels.lowest_multi(price, lengths)
 
-    # simple moving average values calculated by the imported function.
-    sma_values = ta.sma(close=close, length=length)
 
-    sma_std = sma_values.rolling(rolling_length).std()
+def sma_multi(close, lengths):
+    # Simple moving average for every length in lengths, as a (lengths x candles) array.
+    return kernels.sma_multi(close, lengths)
 
-    return sma_std
 
+def atr_multi(high, low, close, lengths):
+    # Average true range for every length in lengths, as a (lengths x candles) array. The true range is computed once
+    # and shared by all the lengths.
+    return kernels.atr_multi(high, low, close, lengths)
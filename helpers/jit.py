@@ -0,0 +1,52 @@
+import os
+import types
+
+# numba compiled versions of the functions passed to compiled(), or None when numba is not available
+_compiled = {}
+
+
+def jit_enabled():
+	# numba is optional: without it (or with ALGO_TRADING_JIT=0) the plain python loops are used
+	if os.environ.get('ALGO_TRADING_JIT', '1') == '0':
+		return False
+
+	try:
+		import numba
+	except ImportError:
+		return False
+
+	return True
+
+
+def jitable(function):
+	# marks a helper of the functions passed to compiled(), which is then compiled along with them
+	function.jitable = True
+	return function
+
+
+def compiled(function):
+	"""
+	numba compiled version of function, or None when the JIT is not enabled. numba is only imported on the first call,
+	and compiled functions are cached on disk, so only the first run of a loop pays for its compilation. The @jitable
+	helpers called by function are compiled as well, and replace the python ones in the globals of its compiled version.
+	"""
+	if function not in _compiled:
+		if jit_enabled():
+			from numba import njit
+
+			namespace = dict(function.__globals__)
+			for name in function.__code__.co_names:
+				if getattr(namespace.get(name), 'jitable', False):
+					namespace[name] = compiled(namespace[name])
+
+			function_copy = types.FunctionType(function.__code__, namespace, function.__name__, function.__defaults__)
+			function_copy.__qualname__ = function.__qualname__
+			function_copy.__module__ = function.__module__
+
+			# helpers are inlined, as calls passing arrays around cost more than the loops of most of them
+			inline = 'always' if getattr(function, 'jitable', False) else 'never'
+			_compiled[function] = njit(cache=True, nogil=True, inline=inline)(function_copy)
+		else:
+			_compiled[function] = None
+
+	return _compiled[function]
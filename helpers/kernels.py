@@ -0,0 +1,392 @@
+import sys
+
+import numpy as np
+
+from helpers.jit import compiled
+
+
+# Indicator kernels working directly on contiguous float64 arrays, without building pandas objects. The functions of
+# "indicators.py" are thin adapters over them. Missing values are only expected at the beginning of the inputs (e.g.
+# the warmup of a chained indicator), as the data providers drop incomplete candles.
+
+
+def as_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def linear_filter(values, factor, gain, initial=0.0, block=16):
+    # First order recursion y[i] = factor * y[i - 1] + gain * values[i], starting from y[-1] = initial.
+    #
+    # The series is split in blocks: the response of every block to its own values is a single matrix product. The
+    # values carried from one block to the next follow the same recursion over the last value of every block, which
+    # is solved by a recursive call on a series block times shorter.
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = values
+
+    powers = factor ** np.arange(block + 1)
+    lags = np.subtract.outer(np.arange(block), np.arange(block))
+    transfer = np.where(lags >= 0, gain * powers[np.clip(lags, 0, block)], 0.0)
+
+    responses = padded.reshape(blocks, block) @ transfer.T
+
+    carries = np.full(blocks, initial)
+    if blocks > 1:
+        carries[1:] = linear_filter(responses[:-1, -1], powers[block], 1.0, initial, block)
+
+    return (responses + np.multiply.outer(carries, powers[1:])).ravel()[:n]
+
+
+def _ewm_alpha(span=None, alpha=None):
+    # weight of the newest value, derived from the center of mass as pandas does
+    com = (span - 1) / 2 if span is not None else (1 - alpha) / alpha
+
+    return 1.0 / (1.0 + com)
+
+
+def _same_value_runs(values):
+    # number of consecutive candles, up to each one, with the same value
+    changes = np.r_[True, values[1:] != values[:-1]]
+    starts = np.flatnonzero(changes)
+
+    return np.arange(len(values)) - starts[np.cumsum(changes) - 1] + 1
+
+
+def streak(condition):
+    # number of consecutive candles, up to each one, where condition holds (0 where it does not)
+    condition = np.asarray(condition, dtype=bool)
+    counts = np.arange(1, len(condition) + 1)
+    last_false = np.maximum.accumulate(np.where(condition, 0, counts))
+
+    return (counts - last_false).astype(np.float64)
+
+
+def sma_multi(close, lengths):
+    # Simple moving average for every length in lengths, as a (lengths x candles) array. All the window sums come from
+    # a single cumulative sum. The first price is subtracted beforehand to limit the rounding error of long sums, and
+    # windows of a single repeated value are set to the value itself.
+    close = as_array(close)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n = len(close)
+
+    missing = ~np.isfinite(close)
+    base = close[~missing][0] if n and not missing.all() else 0.0
+    cumulative = np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, close - base))])
+    missing_count = np.concatenate([[0], np.cumsum(missing)])
+    runs = _same_value_runs(close) if n else np.empty(0, dtype=np.int64)
+
+    values = np.full((len(lengths), n), np.nan)
+    for row, length in enumerate(lengths):
+        if length > n:
+            continue
+
+        means = (cumulative[length:] - cumulative[:n - length + 1]) / length + base
+        means = np.where(runs[length - 1:] >= length, close[length - 1:], means)
+
+        # windows with missing values have no average, as in pandas
+        values[row, length - 1:] = np.where(missing_count[length:] > missing_count[:n - length + 1], np.nan, means)
+
+    return values
+
+
+def sma(close, length):
+    return sma_multi(close, [length])[0]
+
+
+def ema(close, length):
+    # Exponential moving average seeded with the average of the first length prices, as in pandas_ta.
+    close = as_array(close)
+    n = len(close)
+    values = np.full(n, np.nan)
+
+    if length > n:
+        return values
+
+    alpha = _ewm_alpha(span=length)
+    seed = np.nanmean(close[:length])
+
+    values[length - 1] = seed
+    values[length:] = linear_filter(close[length:], 1.0 - alpha, alpha, initial=seed)
+
+    return values
+
+
+def rma(values, length, min_periods=None):
+    # Wilder's moving average (alpha of 1 / length) with the adjusted weights of pandas ewm. Leading missing values
+    # are skipped, and the first min_periods (length by default) valid values produce no average.
+    values = as_array(values)
+    min_periods = length if min_periods is None else min_periods
+    averages = np.full(len(values), np.nan)
+
+    valid = np.flatnonzero(np.isfinite(values))
+    if not len(valid):
+        return averages
+
+    first = valid[0]
+    factor = 1.0 - _ewm_alpha(alpha=1.0 / length)
+
+    # weighted sum of the values over the sum of the weights
+    sums = linear_filter(values[first:], factor, 1.0)
+    weights = linear_filter(np.ones(len(values) - first), factor, 1.0)
+
+    averages[first:] = sums / weights
+    averages[first:first + min_periods - 1] = np.nan
+
+    return averages
+
+
+def rsi(close, length):
+    close = as_array(close)
+    change = np.r_[np.nan, np.diff(close)]
+
+    gains = rma(np.where(change < 0, 0.0, change), length)
+    losses = rma(np.where(change > 0, 0.0, -change), length)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 * gains / (gains + losses)
+
+
+def rolling_std(values, length, ddof=1, chunk_size=1 << 20):
+    # Rolling standard deviation, computed in two passes (mean, then squared deviations) over strided window views.
+    # Windows are processed in chunks of at most chunk_size values, to bound the temporary arrays.
+    values = as_array(values)
+    n = len(values)
+    deviations = np.full(n, np.nan)
+
+    if length > n:
+        return deviations
+
+    windows = np.lib.stride_tricks.sliding_window_view(values, length)
+    step = max(1, chunk_size // length)
+
+    for first in range(0, len(windows), step):
+        deviations[length - 1 + first:length - 1 + first + step] = windows[first:first + step].std(axis=1, ddof=ddof)
+
+    return deviations
+
+
+def bbands(close, length=20, std=2.0):
+    # Lower, mid and upper bands, as rows of a (3 x candles) array. The deviation is the population one, as in
+    # pandas_ta.
+    close = as_array(close)
+    mid = sma(close, length)
+    deviation = std * rolling_std(close, length, ddof=0)
+
+    return np.vstack([mid - deviation, mid, mid + deviation])
+
+
+def _rolling_extreme(price, length, reduce, identity):
+    # Extreme of the windows of length candles, with the van Herk/Gil-Werman method: prices are split in blocks of
+    # length candles, and every window is covered by the tail of one block and the head of the next one, whose
+    # running extremes are two accumulations.
+    price = as_array(price)
+    n = len(price)
+    values = np.full(n, np.nan)
+
+    if length > n:
+        return values
+
+    blocks = -(-n // length)
+    padded = np.full(blocks * length, identity)
+    padded[:n] = price
+    padded = padded.reshape(blocks, length)
+
+    heads = reduce.accumulate(padded, axis=1).ravel()
+    tails = reduce.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    values[length - 1:] = reduce(tails[:n - length + 1], heads[length - 1:n])
+
+    return values
+
+
+def highest(price, length):
+    return _rolling_extreme(price, length, np.maximum, -np.inf)
+
+
+def lowest(price, length):
+    return _rolling_extreme(price, length, np.minimum, np.inf)
+
+
+def _rolling_extreme_multi(price, lengths, reduce):
+    # Sparse table of the extremes of the windows of 2^k candles ending at each candle. Any window length L is then
+    # covered by two overlapping power-of-two windows: the one ending at the candle and the one starting L candles
+    # before it.
+    price = as_array(price)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n = len(price)
+
+    table = [price]
+    for k in range(1, int(np.log2(lengths.max())) + 1):
+        span = 1 << (k - 1)
+        level = np.full(n, np.nan)
+        level[span:] = reduce(table[-1][span:], table[-1][:-span])
+        table.append(level)
+
+    values = np.full((len(lengths), n), np.nan)
+    for row, length in enumerate(lengths):
+        if length > n:
+            continue
+
+        k = int(np.log2(length))
+        offset = length - (1 << k)
+        values[row, length - 1:] = reduce(table[k][length - 1:], table[k][length - 1 - offset:n - offset])
+
+    return values
+
+
+def highest_multi(price, lengths):
+    return _rolling_extreme_multi(price, lengths, np.maximum)
+
+
+def lowest_multi(price, lengths):
+    return _rolling_extreme_multi(price, lengths, np.minimum)
+
+
+def true_range(high, low, close):
+    # Largest of the candle range and the distances from the previous close. The first candle has no previous close,
+    # so its true range is its own range.
+    high = as_array(high)
+    low = as_array(low)
+    previous_close = np.r_[np.nan, as_array(close)[:-1]]
+
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+
+def atr(high, low, close, length):
+    return sma(true_range(high, low, close), length)
+
+
+def atr_multi(high, low, close, lengths):
+    return sma_multi(true_range(high, low, close), lengths)
+
+
+def sma_std(close, length, rolling_length):
+    # sample standard deviation of the simple moving average
+    return rolling_std(sma(close, length), rolling_length, ddof=1)
+
+
+def dema(close, length):
+    # double exponential moving average, with the second average seeded like pandas_ta does
+    first = ema(close, length)
+
+    return 2 * first - ema(first, length)
+
+
+def wilder_atr(high, low, close, length):
+    # Average true range as in pandas_ta: Wilder's average of the true range, which has no value on the first candle
+    # and is shifted by the machine epsilon when any candle has no range.
+    high = as_array(high)
+    low = as_array(low)
+    previous_close = np.r_[np.nan, as_array(close)[:-1]]
+
+    candle_range = high - low
+    if (candle_range == 0).any():
+        candle_range += sys.float_info.epsilon
+
+    ranges = np.fmax(candle_range, np.fmax(np.abs(high - previous_close), np.abs(previous_close - low)))
+    ranges[:1] = np.nan
+
+    return rma(ranges, length)
+
+
+def _supertrend_loop(close, upper, lower, direction, trend, long, short):
+    # The direction flips when the close crosses the band of the previous candle. While it does not, the band of the
+    # current direction only moves in its favour (the lower band never goes down, the upper band never goes up).
+    for i in range(1, len(close)):
+        if close[i] > upper[i - 1]:
+            direction[i] = 1.0
+        elif close[i] < lower[i - 1]:
+            direction[i] = -1.0
+        else:
+            direction[i] = direction[i - 1]
+
+            if direction[i] > 0 and lower[i] < lower[i - 1]:
+                lower[i] = lower[i - 1]
+
+            if direction[i] < 0 and upper[i] > upper[i - 1]:
+                upper[i] = upper[i - 1]
+
+        if direction[i] > 0:
+            trend[i] = long[i] = lower[i]
+        else:
+            trend[i] = short[i] = upper[i]
+
+
+def supertrend(high, low, close, length=7, multiplier=3.0, jit=True):
+    # Supertrend line, direction (1 or -1), long and short lines, as the rows of a (4 x candles) array, in the order
+    # of the pandas_ta columns. The band flip recursion runs compiled by numba when it is available, and over python
+    # lists otherwise, which is several times faster than indexing numpy arrays one element at a time.
+    high = as_array(high)
+    low = as_array(low)
+    close = as_array(close)
+    n = len(close)
+
+    middle = 0.5 * (high + low)
+    band = multiplier * wilder_atr(high, low, close, length)
+    upper = middle + band
+    lower = middle - band
+
+    direction = np.ones(n)
+    trend = np.zeros(n)
+    long = np.full(n, np.nan)
+    short = np.full(n, np.nan)
+
+    loop = compiled(_supertrend_loop) if jit else None
+
+    if loop is not None:
+        loop(close, upper, lower, direction, trend, long, short)
+    else:
+        arrays = [close, upper, lower, direction, trend, long, short]
+        lists = [array.tolist() for array in arrays]
+        _supertrend_loop(*lists)
+
+        direction, trend, long, short = (np.array(values) for values in lists[3:])
+
+    return np.vstack([trend, direction, long, short])
+
+
+if __name__ == '__main__':
+    # Validation of the kernels against pandas_ta (and pandas, for the indicators pandas_ta does not have).
+    import pandas as pd
+    import pandas_ta as ta
+    from backtesting.test import GOOG
+
+    close = GOOG.Close.to_numpy(dtype=np.float64)
+    high = GOOG.High.to_numpy(dtype=np.float64)
+    low = GOOG.Low.to_numpy(dtype=np.float64)
+    series = pd.Series(close)
+
+    previous_close = pd.Series(close).shift()
+    reference_true_range = pd.concat(
+        [pd.Series(high - low), (pd.Series(high) - previous_close).abs(), (pd.Series(low) - previous_close).abs()],
+        axis=1
+    ).max(axis=1)
+
+    for length in (2, 5, 14, 20, 50):
+        checks = {
+            'sma': (sma(close, length), ta.sma(close=series, length=length)),
+            'ema': (ema(close, length), ta.ema(close=series, length=length)),
+            'rsi': (rsi(close, length), ta.rsi(close=series, length=length)),
+            'bbands': (bbands(close, length, 2.0), ta.bbands(close=series, length=length, std=2.0).iloc[:, :3].T),
+            'atr': (atr(high, low, close, length), reference_true_range.rolling(length).mean()),
+            'highest': (highest(high, length), pd.Series(high).rolling(length).max()),
+            'lowest': (lowest(low, length), pd.Series(low).rolling(length).min()),
+            'sma_std': (sma_std(close, length, 10), ta.sma(close=series, length=length).rolling(10).std()),
+            'dema': (dema(close, length), ta.dema(close=series, length=length)),
+            'supertrend': (
+                supertrend(high, low, close, length, 3.0),
+                ta.supertrend(pd.Series(high), pd.Series(low), series, length, 3.0).T
+            ),
+        }
+
+        for name, (values, reference) in checks.items():
+            reference = np.asarray(reference, dtype=np.float64)
+            # the online window variance of pandas drifts slightly, hence the tolerance of the deviations
+            same = np.allclose(values, reference, rtol=1e-7, atol=1e-8, equal_nan=True)
+            error = np.nanmax(np.abs(values - reference))
+
+            print(f"{name:>10} length {length:>2}: {'ok' if same else 'MISMATCH'} (max abs error {error:.2e})")
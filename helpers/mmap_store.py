@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from helpers.functions import DATA_DIR, OhlcProvider, YahooProvider, iter_ohlc_chunks
+
+# default location of the binary store (data/store, at the repo root)
+STORE_DIR = os.path.join(DATA_DIR, 'store')
+
+
+class MmapOhlc:
+	"""
+	Memory-mapped OHLCV series of a single ticker.
+
+	The index is an int64 array of epoch nanoseconds (UTC) and every column is a fixed-width array of its own file.
+	Slicing by date only binary searches the index and returns views, so the operating system reads just the pages
+	of the requested window.
+	"""
+
+	def __init__(self, path):
+		with open(os.path.join(path, 'meta.json')) as file:
+			meta = json.load(file)
+
+		self.path = path
+		self.tz = meta['tz']
+		self.length = meta['length']
+		self.covered = (pd.Timestamp(meta['covered'][0]), pd.Timestamp(meta['covered'][1]))
+
+		# np.memmap does not accept empty files
+		if self.length:
+			self.index = np.memmap(os.path.join(path, 'index.bin'), dtype=np.int64, mode='r', shape=(self.length,))
+			self.columns = {
+				column: np.memmap(os.path.join(path, f'{column}.bin'), dtype=dtype, mode='r', shape=(self.length,))
+				for column, dtype in meta['columns'].items()
+			}
+		else:
+			self.index = np.empty(0, dtype=np.int64)
+			self.columns = {column: np.empty(0, dtype=dtype) for column, dtype in meta['columns'].items()}
+
+	def __len__(self):
+		return self.length
+
+	def _to_epoch_ns(self, date):
+		date = pd.Timestamp(date)
+
+		# naive dates are taken in the timezone of the stored data
+		if date.tz is None and self.tz is not None:
+			date = date.tz_localize(self.tz)
+
+		if date.tz is not None:
+			date = date.tz_convert('UTC').tz_localize(None)
+
+		return date.value
+
+	def bounds(self, start_date=None, end_date=None):
+		# positions of the [start, end) window
+		first = 0 if start_date is None else int(np.searchsorted(self.index, self._to_epoch_ns(start_date)))
+		last = self.length if end_date is None else int(np.searchsorted(self.index, self._to_epoch_ns(end_date)))
+
+		return first, last
+
+	def slice(self, start_date=None, end_date=None):
+		first, last = self.bounds(start_date, end_date)
+
+		return self.index[first:last], {column: values[first:last] for column, values in self.columns.items()}
+
+	def datetime_index(self, index):
+		index = pd.DatetimeIndex(np.asarray(index).view('datetime64[ns]'))
+
+		if self.tz is not None:
+			index = index.tz_localize('UTC').tz_convert(self.tz)
+
+		return index
+
+	def frame(self, first, last):
+		# frame of the bars at positions [first, last)
+		columns = {column: values[first:last] for column, values in self.columns.items()}
+
+		return pd.DataFrame(columns, index=self.datetime_index(self.index[first:last]), copy=False)
+
+	def to_frame(self, start_date=None, end_date=None):
+		return self.frame(*self.bounds(start_date, end_date))
+
+
+class MmapOhlcStore(OhlcProvider):
+	"""
+	Directory of MmapOhlc series, keyed by ticker, interval and adjustment mode.
+
+	Used as a provider, series missing from the store (or not covering the requested dates) are retrieved from the
+	source provider and written once, so later runs only map the binary files.
+	"""
+
+	def __init__(self, store_dir=STORE_DIR, source=None):
+		self.store_dir = store_dir
+		self.source = YahooProvider() if source is None else source
+		self._opened = {}
+
+	def _path(self, ticker, interval, auto_adjust):
+		safe_ticker = re.sub(r'[^A-Za-z0-9_-]', '_', ticker)
+		mode = 'adj' if auto_adjust else 'raw'
+
+		return os.path.join(self.store_dir, f"{safe_ticker}_{interval}_{mode}")
+
+	def write(self, ticker, interval, auto_adjust, data, start_date, end_date):
+		path = self._path(ticker, interval, auto_adjust)
+		tmp_path = path + '.tmp'
+
+		shutil.rmtree(tmp_path, ignore_errors=True)
+		os.makedirs(tmp_path)
+
+		index = data.index
+		tz = None if index.tz is None else str(index.tz)
+
+		if tz is not None:
+			index = index.tz_convert('UTC').tz_localize(None)
+
+		np.ascontiguousarray(index.values.astype('datetime64[ns]').view(np.int64)).tofile(os.path.join(tmp_path, 'index.bin'))
+
+		columns = {}
+		for column in data.columns:
+			values = np.ascontiguousarray(data[column].to_numpy())
+			values.tofile(os.path.join(tmp_path, f'{column}.bin'))
+			columns[column] = values.dtype.str
+
+		# [start, end) dates requested from the source when the series was written
+		covered = [pd.Timestamp(start_date).isoformat(), pd.Timestamp(end_date).isoformat()]
+
+		with open(os.path.join(tmp_path, 'meta.json'), 'w') as file:
+			json.dump({'length': len(data), 'tz': tz, 'columns': columns, 'covered': covered}, file)
+
+		# swap the directories only after every file is written, and drop the maps of the old files
+		self._opened.pop(path, None)
+		shutil.rmtree(path, ignore_errors=True)
+		os.replace(tmp_path, path)
+
+	def open(self, ticker, interval, auto_adjust=True):
+		path = self._path(ticker, interval, auto_adjust)
+
+		if path not in self._opened:
+			if not os.path.exists(path):
+				return None
+
+			self._opened[path] = MmapOhlc(path)
+
+		return self._opened[path]
+
+	def series(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		# stored series covering [start, end), built from the source when needed
+		start = pd.Timestamp(start_date)
+		end = pd.Timestamp(end_date)
+		series = self.open(ticker, interval, auto_adjust)
+
+		if series is None or start < series.covered[0] or end > series.covered[1]:
+			# (re)build the stored series from the source, extended to the requested dates
+			if series is not None:
+				start = min(start, series.covered[0])
+				end = max(end, series.covered[1])
+
+			data = self.source.get_ohlc_data(ticker, start, end, interval, auto_adjust)
+			self.write(ticker, interval, auto_adjust, data, start, end)
+			series = self.open(ticker, interval, auto_adjust)
+
+		return series
+
+	def get_ohlc_data(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		return self.series(ticker, start_date, end_date, interval, auto_adjust).to_frame(start_date, end_date)
+
+
+def read_ohlc_chunks(ticker, start_date, end_date, interval, chunk_size, warmup=0, auto_adjust=True, store=None):
+	"""
+	Stream the [start, end) bars of a ticker from the binary store in chunks of chunk_size bars, each preceded by up to
+	warmup bars of history, as (frame, n_warmup) tuples. Only the pages of the current chunk are read from disk.
+	"""
+	if store is None:
+		store = MmapOhlcStore()
+
+	series = store.series(ticker, start_date, end_date, interval, auto_adjust)
+	first, last = series.bounds(start_date, end_date)
+
+	return iter_ohlc_chunks(series, chunk_size, warmup, first, last)
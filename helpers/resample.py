@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from helpers.functions import OhlcProvider, default_provider
+
+# approximate length of each interval accepted by get_ohlc_data, used to tell finer from coarser bar sizes
+INTERVAL_LENGTHS = {
+	"1m": pd.Timedelta(minutes=1),
+	"2m": pd.Timedelta(minutes=2),
+	"5m": pd.Timedelta(minutes=5),
+	"15m": pd.Timedelta(minutes=15),
+	"30m": pd.Timedelta(minutes=30),
+	"60m": pd.Timedelta(minutes=60),
+	"90m": pd.Timedelta(minutes=90),
+	"1h": pd.Timedelta(minutes=60),
+	"1d": pd.Timedelta(days=1),
+	"5d": pd.Timedelta(days=5),
+	"1wk": pd.Timedelta(weeks=1),
+	"1mo": pd.Timedelta(days=30),
+	"3mo": pd.Timedelta(days=91),
+}
+
+# calendar intervals are labeled by the first day of their period, like yahoo finance does
+PERIOD_INTERVALS = {"1wk": "W-SUN", "1mo": "M", "3mo": "Q"}
+
+
+def bucket_labels(index, interval):
+	# label of the bar of the target interval that each timestamp belongs to
+	if interval == "5d":
+		# the 5 day bars of yahoo finance span 5 trading days, which no calendar bucket reproduces
+		raise Exception("Cannot derive 5d bars from finer ones, use 1wk bars instead")
+
+	if interval in PERIOD_INTERVALS:
+		tz = index.tz
+		labels = index.tz_localize(None).to_period(PERIOD_INTERVALS[interval]).start_time
+
+		return labels if tz is None else labels.tz_localize(tz)
+
+	# intraday bars are aligned to the round clock time (e.g. 60m bars start at 10:00, and not at 9:30)
+	return index.floor(INTERVAL_LENGTHS[interval])
+
+
+def bucket_end(label, interval):
+	# end (exclusive) of the bar of the target interval with the given label
+	if interval in PERIOD_INTERVALS:
+		tz = label.tz
+		end = (label.tz_localize(None).to_period(PERIOD_INTERVALS[interval]) + 1).start_time
+
+		return end if tz is None else end.tz_localize(tz)
+
+	return label + INTERVAL_LENGTHS[interval]
+
+
+def resample_ohlc(data, interval):
+	"""
+	Aggregate sorted OHLCV bars into a coarser interval.
+
+	Bars are grouped by contiguous runs of the same bucket label and every column is reduced with one segment
+	reduction: first Open, maximum High, minimum Low, last Close (and Adj Close) and summed Volume.
+	"""
+	if not len(data):
+		return data.copy()
+
+	labels = bucket_labels(data.index, interval)
+	codes = labels.asi8
+
+	# first and last position of each bucket
+	starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+	ends = np.r_[starts[1:], len(codes)] - 1
+
+	aggregated = {}
+	for column in data.columns:
+		values = data[column].to_numpy()
+
+		if column == "Open":
+			aggregated[column] = values[starts]
+		elif column == "High":
+			aggregated[column] = np.maximum.reduceat(values, starts)
+		elif column == "Low":
+			aggregated[column] = np.minimum.reduceat(values, starts)
+		elif column == "Volume":
+			aggregated[column] = np.add.reduceat(values, starts)
+		else:
+			aggregated[column] = values[ends]
+
+	return pd.DataFrame(aggregated, index=labels[starts])
+
+
+class ResamplingProvider(OhlcProvider):
+	"""
+	Provider that derives every interval coarser than base_interval from the base series of its source.
+
+	Resampled series, and the base series they come from, are memoized per (ticker, interval, adjustment mode), so a
+	multi-timeframe study costs a single fetch of the base interval. A memoized series is reused while the requested
+	dates lie inside the dates it was built from, and it is rebuilt over the union of both ranges otherwise.
+
+	Resampled bars are always whole: the base candles are fetched from the start of the bar the start date falls in,
+	up to the end of the last bar that starts before the end date.
+	"""
+
+	def __init__(self, source=None, base_interval="1d", maxsize=64):
+		self.source = default_provider() if source is None else source
+		self.base_interval = base_interval
+		self.maxsize = maxsize
+		self._resampled = OrderedDict()
+		self._lock = threading.Lock()
+
+	def _memoized(self, key, start, end, build):
+		# series of key covering [start, end), rebuilt over the union of the dates when it does not cover them
+		with self._lock:
+			memo = self._resampled.get(key)
+
+		if memo is None or start < memo[0] or end > memo[1]:
+			if memo is not None:
+				start, end = min(start, memo[0]), max(end, memo[1])
+
+			memo = (start, end, build(start, end))
+
+			with self._lock:
+				self._resampled[key] = memo
+
+				if len(self._resampled) > self.maxsize:
+					self._resampled.popitem(last=False)
+
+		with self._lock:
+			if key in self._resampled:
+				self._resampled.move_to_end(key)
+
+		return memo[2]
+
+	def get_ohlc_data(self, ticker, start_date, end_date, interval, auto_adjust=True):
+		if INTERVAL_LENGTHS[interval] < INTERVAL_LENGTHS[self.base_interval]:
+			raise Exception(f"Cannot derive {interval} bars from {self.base_interval} bars")
+
+		start = pd.Timestamp(start_date)
+		end = pd.Timestamp(end_date)
+
+		def base(base_start, base_end):
+			return self.source.get_ohlc_data(ticker, base_start, base_end, self.base_interval, auto_adjust)
+
+		if interval == self.base_interval:
+			data = self._memoized((ticker, interval, auto_adjust), start, end, base)
+			first_label = start
+		else:
+			def resampled(base_start, base_end):
+				base_data = self._memoized((ticker, self.base_interval, auto_adjust), base_start, base_end, base)
+				return resample_ohlc(base_data, interval)
+
+			# keep the bar the start date falls in, whose label may be before the start date, and build the bars
+			# from the base candles of their whole periods
+			first_label = bucket_labels(pd.DatetimeIndex([start]), interval)[0]
+			last_label = bucket_labels(pd.DatetimeIndex([end - pd.Timedelta(1, 'ns')]), interval)[0]
+
+			data = self._memoized(
+				(ticker, interval, auto_adjust), first_label, bucket_end(last_label, interval), resampled
+			)
+
+		if data.index.tz is not None:
+			first_label = first_label.tz_localize(data.index.tz)
+			end = end.tz_localize(data.index.tz)
+
+		return data[(data.index >= first_label) & (data.index < end)]
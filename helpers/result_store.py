@@ -0,0 +1,155 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+from helpers.functions import DATA_DIR
+
+# default location of the result store (data/results.sqlite, at the repo root)
+RESULTS_PATH = os.path.join(DATA_DIR, 'results.sqlite')
+
+# settings of Backtest that change its results, with their defaults, so that omitted and default settings share a key
+BACKTEST_SETTINGS = {
+	'cash': 10_000,
+	'commission': .0,
+	'margin': 1.,
+	'trade_on_close': False,
+	'hedging': False,
+	'exclusive_orders': False,
+}
+
+
+def strategy_source(strategy):
+	# source of the strategy class and of its parents, up to the Strategy class of backtesting.py. Classes created on
+	# the fly, which have no source file, are identified by the source of their methods.
+	sources = []
+
+	for cls in strategy.__mro__:
+		if cls.__module__.startswith('backtesting') or cls is object:
+			break
+
+		try:
+			sources.append(inspect.getsource(cls))
+		except (OSError, TypeError):
+			sources.append(cls.__qualname__)
+			sources += [inspect.getsource(value) for value in vars(cls).values() if inspect.isfunction(value)]
+
+	return '\n'.join(sources)
+
+
+def data_fingerprint(data):
+	# hash of the index, columns and values of an OHLC frame
+	digest = hashlib.blake2b(digest_size=16)
+	digest.update(repr(list(data.columns)).encode())
+	digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+
+	return digest.hexdigest()
+
+
+def _jsonable(value):
+	# parameter values as json: numpy scalars as python ones, sequences as lists and functions by their qualified name,
+	# with their source for lambdas and local functions, whose names are not unique
+	if isinstance(value, np.generic):
+		return value.item()
+	if isinstance(value, (range, tuple, np.ndarray)):
+		return list(value)
+	if isinstance(value, (set, frozenset)):
+		return sorted(value, key=repr)
+	if callable(value) and hasattr(value, '__qualname__'):
+		name = f"{value.__module__}.{value.__qualname__}"
+		return name if '<' not in name else [name, inspect.getsource(value)]
+
+	# the repr of other objects can hold their memory address, which changes from run to run
+	raise Exception(f"Cannot use a {type(value).__name__} object in a result key: {value!r}")
+
+
+def result_key(strategy, params, data, **settings):
+	"""
+	Key of a backtest: a hash of the source of the strategy, its parameters, the fingerprint of the data and the
+	Backtest settings, where the omitted ones take their defaults. Other settings that change the result, such as the
+	statistic an optimization maximizes, can be given as well.
+	"""
+	content = json.dumps({
+		'strategy': strategy_source(strategy),
+		'params': params,
+		'data': data if isinstance(data, str) else data_fingerprint(data),
+		'settings': BACKTEST_SETTINGS | settings,
+	}, sort_keys=True, default=_jsonable)
+
+	return hashlib.sha256(content.encode()).hexdigest()
+
+
+def storable(stats):
+	# statistics of Backtest.run without the strategy instance, which holds the whole backtest and cannot be pickled
+	return stats.drop('_strategy', errors='ignore')
+
+
+class ResultStore:
+	"""
+	Persistent store of backtest results in a SQLite file, addressed by result_key. Only the source of the strategy
+	classes is hashed, not the one of the indicators they call: clear() the store after changing those.
+
+	    store = ResultStore()
+	    stats = store.run(data, MaxMin, {'highest_length': 20}, commission=.001)
+	"""
+
+	def __init__(self, path=RESULTS_PATH):
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+		self.path = path
+		self._connection = sqlite3.connect(path)
+		self._connection.execute(
+			'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)'
+		)
+		self._connection.commit()
+
+	def __len__(self):
+		return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+	def __contains__(self, key):
+		return self._connection.execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() is not None
+
+	def key(self, strategy, params, data, **settings):
+		return result_key(strategy, params, data, **settings)
+
+	def get(self, key, default=None):
+		row = self._connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+
+		return default if row is None else pickle.loads(row[0])
+
+	def put(self, key, value):
+		# committed right away, so that an interrupted sweep keeps every result stored before it stopped
+		self._connection.execute(
+			'INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)',
+			(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time())
+		)
+		self._connection.commit()
+
+	def clear(self):
+		self._connection.execute('DELETE FROM results')
+		self._connection.commit()
+
+	def close(self):
+		self._connection.close()
+
+	def run(self, data, strategy, params=None, **settings):
+		"""
+		Statistics of Backtest(data, strategy, **settings).run(**params), read from the store when the same backtest
+		was run before, and stored otherwise. They lack the _strategy entry of Backtest.run.
+		"""
+		params = params or {}
+		key = self.key(strategy, params, data, **settings)
+		stats = self.get(key)
+
+		if stats is None:
+			stats = storable(Backtest(data, strategy, **settings).run(**params))
+			self.put(key, stats)
+
+		return stats
@@ -0,0 +1,321 @@
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+
+# Budgeted parameter searches, as cheaper alternatives to the exhaustive grid of Backtest.optimize. Every search takes
+# an objective(params, data) to maximize, the grid of parameter values (as the arguments of Backtest.optimize) and a
+# budget of evaluations and/or seconds, and returns a SearchResult with the best parameters and the best-so-far curve.
+#
+#     result = tpe_search(backtest_objective(MaxMin, 'Sharpe Ratio'), grid, data, max_evals=200)
+
+
+class SearchResult:
+	def __init__(self, best_params, best_value, curve):
+		self.best_params = best_params
+		self.best_value = best_value
+
+		# one row per evaluation: elapsed seconds, candles of data used, parameters, value and best value so far
+		self.curve = curve
+
+	def __repr__(self):
+		return (
+			f"SearchResult(best_params={self.best_params}, best_value={self.best_value}, "
+			f"evaluations={len(self.curve)})"
+		)
+
+
+def backtest_objective(strategy, maximize='SQN', cash=10_000, store=None, **settings):
+	"""
+	Objective of the searches: the maximize statistic (a name or a function of the stats, as in Backtest.optimize) of
+	a backtest of the strategy, run by VectorizedBacktest when the strategy supports it. With a ResultStore, the values
+	are stored, so that a search run again with the same seed replays the evaluations it already made.
+	"""
+	from backtesting import Backtest
+	from helpers.vectorized import VectorizedBacktest
+
+	vectorized = hasattr(strategy, 'signals') or hasattr(strategy, 'bar_loop')
+
+	def objective(params, data):
+		if store is not None:
+			key = store.key(strategy, params, data, cash=cash, maximize=maximize, **settings)
+			value = store.get(key)
+
+			if value is None:
+				value = evaluate(params, data)
+				store.put(key, value)
+
+			return value
+
+		return evaluate(params, data)
+
+	def evaluate(params, data):
+		if vectorized:
+			return VectorizedBacktest(data, strategy, cash=cash, **settings).statistic(maximize, **params)
+
+		stats = Backtest(data, strategy, cash=cash, **settings).run(**params)
+
+		return maximize(stats) if callable(maximize) else stats[maximize]
+
+	return objective
+
+
+def _grid_values(grid):
+	# names and lists of values of the grid, where a single value is a list of one
+	return list(grid), [
+		list(values) if isinstance(values, (list, tuple, range, np.ndarray)) else [values] for values in grid.values()
+	]
+
+
+def _score(value):
+	# values compared by the searches, with NaN (no trades, for instance) worse than any number
+	value = float(value)
+	return -math.inf if math.isnan(value) else value
+
+
+class _Trace:
+	# evaluations of a search, within the budget of evaluations and seconds
+	def __init__(self, objective, names, values, max_evals, max_time, constraint):
+		if max_evals is None and max_time is None:
+			max_evals = math.prod(len(options) for options in values)
+
+		self.objective = objective
+		self.names = names
+		self.values = values
+		self.max_evals = max_evals
+		self.max_time = max_time
+		self.constraint = constraint
+
+		self.start = time.perf_counter()
+		self.rows = []
+		self.seen = set()
+
+		# shuffled flat indexes of the grid that _random_indexes walks through once random draws keep failing
+		self.remaining = None
+		self.cursor = 0
+
+	def exhausted(self):
+		return (
+			(self.max_evals is not None and len(self.rows) >= self.max_evals) or
+			(self.max_time is not None and time.perf_counter() - self.start >= self.max_time)
+		)
+
+	def params(self, indexes):
+		return {name: options[index] for name, options, index in zip(self.names, self.values, indexes)}
+
+	def admissible(self, indexes):
+		return self.constraint is None or self.constraint(SimpleNamespace(**self.params(indexes)))
+
+	def evaluate(self, indexes, data, best_so_far):
+		params = self.params(indexes)
+		value = self.objective(params, data)
+		self.seen.add(indexes)
+
+		self.rows.append({
+			'elapsed': time.perf_counter() - self.start,
+			'n_bars': len(data),
+			'params': params,
+			'value': value,
+			'best_so_far': best_so_far(value),
+		})
+
+		return _score(value)
+
+	def result(self, best_indexes, best_value):
+		curve = pd.DataFrame(self.rows, columns=['elapsed', 'n_bars', 'params', 'value', 'best_so_far'])
+		curve.index.name = 'evaluation'
+
+		return SearchResult(
+			None if best_indexes is None else self.params(best_indexes),
+			best_value if best_value > -math.inf else math.nan,
+			curve
+		)
+
+
+def _running_best():
+	# best_so_far of the curve: the running maximum of the values
+	best = [-math.inf]
+
+	def update(value):
+		best[0] = max(best[0], _score(value))
+		return best[0] if best[0] > -math.inf else math.nan
+
+	return update
+
+
+def _random_indexes(rng, values, seen, trace):
+	# random admissible combination not evaluated yet, None when there is none left
+	sizes = [len(options) for options in values]
+
+	for _ in range(100 if trace.remaining is None else 0):
+		indexes = tuple(int(rng.integers(n)) for n in sizes)
+		if indexes not in seen and trace.admissible(indexes):
+			return indexes
+
+	# nearly exhausted grids: walk through a single shuffle of the grid. seen only grows, so the combinations skipped
+	# once never need to be checked again.
+	if trace.remaining is None:
+		size = math.prod(sizes)
+		trace.remaining = rng.permutation(size) if size <= 10 ** 7 else np.empty(0, dtype=np.int64)
+
+	while trace.cursor < len(trace.remaining):
+		indexes = tuple(int(index) for index in np.unravel_index(trace.remaining[trace.cursor], sizes))
+		if indexes not in seen and trace.admissible(indexes):
+			return indexes
+		trace.cursor += 1
+
+	return None
+
+
+def random_search(objective, grid, data, max_evals=None, max_time=None, constraint=None, seed=None):
+	"""
+	Evaluate random combinations of the grid, without repetition, until the budget runs out.
+	"""
+	names, values = _grid_values(grid)
+	trace = _Trace(objective, names, values, max_evals, max_time, constraint)
+	rng = np.random.default_rng(seed)
+	best_so_far = _running_best()
+	best_indexes, best_value = None, -math.inf
+
+	while not trace.exhausted():
+		indexes = _random_indexes(rng, values, trace.seen, trace)
+		if indexes is None:
+			break
+
+		value = trace.evaluate(indexes, data, best_so_far)
+		if best_indexes is None or value > best_value:
+			best_indexes, best_value = indexes, value
+
+	return trace.result(best_indexes, best_value)
+
+
+def successive_halving(
+		objective, grid, data, max_evals=None, max_time=None, constraint=None, seed=None, eta=3, min_bars=250
+):
+	"""
+	Successive halving over slices of the data: random candidates are evaluated on the most recent candles, and only
+	the best 1/eta of them go on to the next rung, whose slice is eta times longer, up to the whole data on the last
+	rung. The number of candidates is chosen so that all the rungs fit in max_evals (81 without it). best_so_far is the
+	best value on the longest slice evaluated so far, which is only comparable within a rung.
+	"""
+	names, values = _grid_values(grid)
+	trace = _Trace(objective, names, values, max_evals, max_time, constraint)
+	rng = np.random.default_rng(seed)
+
+	# n + n / eta + n / eta ** 2 + ... evaluations in total
+	n_candidates = int(max_evals * (eta - 1) / eta) if max_evals is not None else 81
+	n_candidates = max(1, min(n_candidates, math.prod(len(options) for options in values)))
+	n_rungs = int(math.log(n_candidates, eta) + 1e-9) + 1
+
+	candidates, drawn = [], set()
+	while len(candidates) < n_candidates:
+		indexes = _random_indexes(rng, values, drawn, trace)
+		if indexes is None:
+			break
+		candidates.append(indexes)
+		drawn.add(indexes)
+
+	best_indexes, best_value = None, -math.inf
+
+	for rung in range(n_rungs):
+		n_bars = min(len(data), max(min_bars, int(len(data) * eta ** (rung - n_rungs + 1))))
+		data_slice = data.iloc[len(data) - n_bars:]
+		best_so_far = _running_best()
+		scores = []
+
+		for indexes in candidates:
+			if trace.exhausted():
+				break
+			scores.append((trace.evaluate(indexes, data_slice, best_so_far), indexes))
+
+		if not scores:
+			break
+
+		# stable sort: ties keep the order of the candidates
+		scores.sort(key=lambda score: -score[0])
+		best_value, best_indexes = scores[0]
+		candidates = [indexes for _, indexes in scores[:max(1, math.ceil(len(scores) / eta))]]
+
+		if trace.exhausted():
+			break
+
+	return trace.result(best_indexes, best_value)
+
+
+def _parzen(indexes, n_values, bandwidth):
+	# probabilities of the n_values options of a parameter: a prior uniform over them, plus a discrete gaussian around
+	# each observed option, which spreads over the neighbouring values of ordered parameters
+	options = np.arange(n_values)
+	density = np.full(n_values, 1. / n_values)
+
+	for index in indexes:
+		density += np.exp(-.5 * ((options - index) / bandwidth) ** 2)
+
+	return density / density.sum()
+
+
+def tpe_search(
+		objective, grid, data, max_evals=None, max_time=None, constraint=None, seed=None, n_startup=10, gamma=.25,
+		n_samples=24
+):
+	"""
+	Tree-structured Parzen estimator search. After n_startup random combinations, the evaluated ones are split into
+	the best gamma fraction and the others, and the option of every parameter is modelled independently by a Parzen
+	density over each group. n_samples combinations are drawn from the density of the best ones, and the one where it
+	is largest relative to the density of the others is evaluated next.
+	"""
+	names, values = _grid_values(grid)
+	trace = _Trace(objective, names, values, max_evals, max_time, constraint)
+	rng = np.random.default_rng(seed)
+	best_so_far = _running_best()
+	sizes = [len(options) for options in values]
+	bandwidths = [max(1., n / 10) for n in sizes]
+
+	history = []
+	best_indexes, best_value = None, -math.inf
+
+	while not trace.exhausted():
+		indexes = None
+
+		if len(history) >= n_startup:
+			ranked = sorted(history, key=lambda item: -item[0])
+			n_good = max(1, math.ceil(gamma * len(ranked)))
+			good = [item[1] for item in ranked[:n_good]]
+			bad = [item[1] for item in ranked[n_good:]]
+
+			good_densities, bad_densities = [], []
+			for k, (n_values, bandwidth) in enumerate(zip(sizes, bandwidths)):
+				good_densities.append(_parzen([item[k] for item in good], n_values, bandwidth))
+				bad_densities.append(_parzen([item[k] for item in bad], n_values, bandwidth))
+
+			samples = np.column_stack([
+				rng.choice(n_values, size=n_samples, p=density) for n_values, density in zip(sizes, good_densities)
+			])
+			scores = sum(
+				np.log(good_densities[k][samples[:, k]] / bad_densities[k][samples[:, k]]) for k in range(len(sizes))
+			)
+
+			for sample in samples[np.argsort(-scores, kind='stable')]:
+				candidate = tuple(int(index) for index in sample)
+				if candidate not in trace.seen and trace.admissible(candidate):
+					indexes = candidate
+					break
+
+		if indexes is None:
+			indexes = _random_indexes(rng, values, trace.seen, trace)
+			if indexes is None:
+				break
+
+		value = trace.evaluate(indexes, data, best_so_far)
+		history.append((value, indexes))
+
+		if best_indexes is None or value > best_value:
+			best_indexes, best_value = indexes, value
+
+	return trace.result(best_indexes, best_value)
+
+
+SEARCHES = {'random': random_search, 'halving': successive_halving, 'tpe': tpe_search}
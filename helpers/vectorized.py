@@ -0,0 +1,633 @@
+import itertools
+import math
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from backtesting._stats import compute_stats, geometric_mean
+
+from helpers.jit import compiled
+
+
+# Fast path of backtesting.Backtest for strategies whose next() only depends on the indicators and on whether a
+# position is open. Their signals() classmethod returns the entries and exits of next() as boolean arrays, and the
+# orders are filled with the rules of backtesting's _Broker (fill prices, commission, margin, SL before TP,
+# trade_on_close and the closing of the open trades on the last candle), so the trades are the ones of Backtest.run.
+
+# default size of Strategy.buy() and Strategy.sell(): all the available margin
+FULL_EQUITY = 1 - sys.float_info.epsilon
+
+# columns of the trades table filled by _simulate_loop
+TRADE_COLUMNS = (
+	'size', 'entry_price', 'entry_bar', 'sl', 'tp', 'opened_at', 'exit_price', 'exit_bar', 'closed_at', 'sequence'
+)
+
+
+def crossover(series1, series2):
+	# Array version of backtesting.lib.crossover: True on the candles where series1 just crossed above series2.
+	series1 = np.broadcast_to(np.asarray(series1, dtype=np.float64), np.shape(series2) or np.shape(series1))
+	series2 = np.broadcast_to(np.asarray(series2, dtype=np.float64), series1.shape)
+
+	crossed = np.zeros(len(series1), dtype=bool)
+	with np.errstate(invalid='ignore'):
+		crossed[1:] = (series1[:-1] < series2[:-1]) & (series1[1:] > series2[1:])
+
+	return crossed
+
+
+def indicator_start(*indicators):
+	# First candle on which Backtest.run calls next(): one candle after the warmup of the slowest indicator.
+	warmups = (np.isnan(np.asarray(indicator, dtype=float)).argmin(axis=-1).max() for indicator in indicators)
+	return 1 + max(warmups, default=0)
+
+
+def strategy_params(strategy, params):
+	# Parameters of a run: the class variables of the strategy, overridden by params (as in Strategy.__init__).
+	for name in params:
+		if not hasattr(strategy, name):
+			raise AttributeError(
+				f"Strategy '{strategy.__name__}' is missing parameter '{name}'. Strategy class should define "
+				f"parameters as class variables before they can be optimized or run with."
+			)
+
+	defaults = {
+		name: getattr(strategy, name) for name in dir(strategy)
+		if not name.startswith('_') and isinstance(getattr(strategy, name), (int, float, str, bool))
+	}
+
+	return SimpleNamespace(**{**defaults, **params})
+
+
+def _next_true(mask):
+	# position of the first True at or after each candle (len(mask) when there is none)
+	n = len(mask)
+	positions = np.where(mask, np.arange(n), n)
+
+	return np.minimum.accumulate(positions[::-1])[::-1]
+
+
+def _simulate_loop(
+		open_, high, low, close, entries, exits, short_entries, sl, tp, next_flat_signal, next_position_signal,
+		start, flat_entries, cash, commission, leverage, trade_on_close, size, trades, open_rows
+):
+	# Order filling of _Broker._process_orders, run only on the candles with a signal, or on which an open trade reaches
+	# its SL/TP or the equity runs out. Every trade is a row of the trades columns (see TRADE_COLUMNS, NaN while unset),
+	# and open_rows has the rows of the open trades, oldest first. Returns the number of rows, the candle of the first
+	# invalid order and the candle on which the equity ran out (-1 when there is none).
+	(
+		sizes, entry_prices, entry_bars, stop_losses, take_profits, opened_at, exit_prices, exit_bars, closed_at, sequence
+	) = trades
+	n = len(close)
+	n_trades = 0
+	n_open = 0
+	n_closed = 0
+
+	candle = start
+	placed = start
+	close_all = False
+	long_order = False
+	short_order = False
+
+	while True:
+		final = candle >= n
+		if final:
+			# the open trades are closed and the last orders are processed on the last candle, as Backtest.run does
+			candle = n - 1
+			close_all = True
+
+		market_price = close[candle - 1] if trade_on_close else open_[candle]
+		market_bar = candle - 1 if trade_on_close else candle
+
+		# closing orders are in front of the queue, newest trade first
+		if close_all:
+			for o in range(n_open - 1, -1, -1):
+				r = open_rows[o]
+				exit_prices[r], exit_bars[r], closed_at[r], sequence[r] = market_price, market_bar, candle, n_closed
+				n_closed += 1
+				cash += sizes[r] * (market_price - entry_prices[r])
+			n_open = 0
+
+		# SL/TP orders of the open trades, then the new orders, then the SL/TP orders of the trades they opened
+		reprocess = False
+		for stage in range(2):
+			if stage and not reprocess:
+				break
+
+			# newest trade first, SL before TP (a NaN SL or TP is never reached)
+			for o in range(n_open - 1, -1, -1):
+				r = open_rows[o]
+				if closed_at[r] >= 0:
+					continue
+
+				if sizes[r] > 0:
+					if low[candle] < stop_losses[r]:
+						price = min(market_price, stop_losses[r])
+					elif high[candle] > take_profits[r]:
+						price = max(open_[candle], take_profits[r])
+					else:
+						continue
+				else:
+					if high[candle] > stop_losses[r]:
+						price = max(market_price, stop_losses[r])
+					elif low[candle] < take_profits[r]:
+						price = min(open_[candle], take_profits[r])
+					else:
+						continue
+
+				exit_prices[r], exit_bars[r], closed_at[r], sequence[r] = price, candle, candle, n_closed
+				n_closed += 1
+				cash += sizes[r] * (price - entry_prices[r])
+
+			if stage:
+				break
+
+			for order in range(2):
+				if not (long_order if order == 0 else short_order):
+					continue
+
+				order_size = size if order == 0 else -size
+				adjusted_price = market_price * (1 + math.copysign(commission, order_size))
+
+				profit = 0.0
+				margin_used = 0.0
+				for o in range(n_open):
+					r = open_rows[o]
+					if not closed_at[r] >= 0:
+						profit += sizes[r] * (close[candle] - entry_prices[r])
+						margin_used += abs(sizes[r]) * close[candle] / leverage
+				margin_available = max(0.0, cash + profit - margin_used)
+
+				need_size = int((margin_available * leverage * abs(order_size)) // adjusted_price)
+				if need_size == 0:
+					continue
+				if order_size < 0:
+					need_size = -need_size
+
+				# opposite trades are closed, or reduced, first in FIFO order
+				for o in range(n_open):
+					r = open_rows[o]
+					if closed_at[r] >= 0 or (sizes[r] > 0) == (need_size > 0):
+						continue
+
+					if abs(need_size) >= abs(sizes[r]):
+						need_size += int(sizes[r])
+					else:
+						# the reduced part is closed as a copy of the trade
+						sizes[r] += need_size
+						sizes[n_trades], entry_prices[n_trades], entry_bars[n_trades] = -need_size, entry_prices[r], entry_bars[r]
+						opened_at[n_trades] = opened_at[r]
+						r = n_trades
+						n_trades += 1
+						need_size = 0
+
+					exit_prices[r], exit_bars[r], closed_at[r], sequence[r] = market_price, market_bar, candle, n_closed
+					n_closed += 1
+					cash += sizes[r] * (market_price - entry_prices[r])
+
+					if need_size == 0:
+						break
+
+				profit = 0.0
+				margin_used = 0.0
+				for o in range(n_open):
+					r = open_rows[o]
+					if not closed_at[r] >= 0:
+						profit += sizes[r] * (close[candle] - entry_prices[r])
+						margin_used += abs(sizes[r]) * close[candle] / leverage
+				margin_available = max(0.0, cash + profit - margin_used)
+
+				# nothing left to open, or not enough liquidity to cover for the order
+				if need_size == 0 or abs(need_size) * adjusted_price > margin_available * leverage:
+					continue
+
+				sizes[n_trades], entry_prices[n_trades], entry_bars[n_trades] = need_size, adjusted_price, market_bar
+				stop_losses[n_trades], take_profits[n_trades], opened_at[n_trades] = sl[placed], tp[placed], candle
+				open_rows[n_open] = n_trades
+				n_open += 1
+				n_trades += 1
+
+				# contingent orders of market entries are checked on the candle of the entry as well
+				if sl[placed] == sl[placed] or tp[placed] == tp[placed]:
+					reprocess = True
+
+		# drop the closed trades from the open ones
+		kept = 0
+		for o in range(n_open):
+			r = open_rows[o]
+			if not closed_at[r] >= 0:
+				open_rows[kept] = r
+				kept += 1
+		n_open = kept
+
+		# out of money: Backtest.run closes the open trades at the close, skipping every other one as it removes them
+		# from the list it iterates, and stops
+		profit = 0.0
+		for o in range(n_open):
+			r = open_rows[o]
+			profit += sizes[r] * (close[candle] - entry_prices[r])
+		if cash + profit <= 0:
+			for o in range(0, n_open, 2):
+				r = open_rows[o]
+				exit_prices[r], exit_bars[r], closed_at[r], sequence[r] = close[candle], candle, candle, n_closed
+				n_closed += 1
+			return n_trades, -1, candle
+
+		if final:
+			return n_trades, -1, -1
+
+		# orders placed by next() on the candle
+		placed = candle
+		close_all = n_open > 0 and exits[candle]
+		long_order = entries[candle] and not (flat_entries and n_open > 0)
+		short_order = short_entries[candle] and not (flat_entries and n_open > 0)
+
+		# same validation as _Broker.new_order
+		if long_order:
+			price = close[candle] * (1 + math.copysign(commission, size))
+			if sl[candle] >= price or tp[candle] <= price:
+				return n_trades, candle, -1
+		if short_order:
+			price = close[candle] * (1 + math.copysign(commission, -size))
+			if tp[candle] >= price or sl[candle] <= price:
+				return n_trades, candle, -1
+
+		if close_all or long_order or short_order:
+			candle += 1
+			continue
+
+		# skip to the next candle with a signal, or on which an open trade reaches its SL/TP or the equity runs out
+		candle += 1
+		if candle >= n or not n_open:
+			candle = next_flat_signal[candle] if candle < n else n
+			continue
+
+		target = next_position_signal[candle]
+		while candle < target:
+			reached = False
+			profit = 0.0
+			for o in range(n_open):
+				r = open_rows[o]
+				profit += sizes[r] * (close[candle] - entry_prices[r])
+				if sizes[r] > 0:
+					reached = reached or low[candle] < stop_losses[r] or high[candle] > take_profits[r]
+				else:
+					reached = reached or high[candle] > stop_losses[r] or low[candle] < take_profits[r]
+
+			if reached or cash + profit <= 0:
+				break
+			candle += 1
+
+
+class Simulation:
+	"""
+	Trades of simulate(), as arrays. The closed trades are in the order Backtest.run closes them, and the trades
+	opened by the orders of the last call of next() are only part of the equity curve, as they are never closed.
+	Simulations that record the equity of every candle (see helpers.bar_loop) pass it as equity.
+	"""
+
+	def __init__(self, trades, close, start, cash, out_of_money=-1, equity=None):
+		self._trades = trades
+		self._out_of_money = out_of_money
+		self._close = close
+		self._start = start
+		self._cash = cash
+		self._equity = equity
+
+		closed = trades['closed_at'] >= 0
+		order = np.argsort(trades['sequence'][closed], kind='stable')
+
+		self.size = trades['size'][closed][order]
+		self.entry_price = trades['entry_price'][closed][order]
+		self.exit_price = trades['exit_price'][closed][order]
+		self.entry_bar = trades['entry_bar'][closed][order].astype(int)
+		self.exit_bar = trades['exit_bar'][closed][order].astype(int)
+
+	def __len__(self):
+		return len(self.size)
+
+	@property
+	def pnl(self):
+		return self.size * (self.exit_price - self.entry_price)
+
+	@property
+	def return_pct(self):
+		return np.copysign(1, self.size) * (self.exit_price / self.entry_price - 1)
+
+	def equity(self):
+		# cash after the trades closed up to each candle, plus the profit of the trades open on it
+		if self._equity is None:
+			trades, close = self._trades, self._close
+			n = len(close)
+
+			if self._start >= n:
+				self._equity = np.full(n, float(self._cash))
+				return self._equity
+
+			closed = trades['closed_at'] >= 0
+			cash_changes = np.bincount(
+				trades['closed_at'][closed].astype(int),
+				weights=trades['size'][closed] * (trades['exit_price'][closed] - trades['entry_price'][closed]),
+				minlength=n
+			)
+			cash_changes[0] = self._cash
+
+			# candles on which each trade is open
+			begin = trades['opened_at'].astype(int)
+			end = np.where(closed, trades['closed_at'], n).astype(int)
+			lengths = end - begin
+			rows = np.repeat(np.arange(len(begin)), lengths)
+			candles = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - begin, lengths)
+
+			open_profit = np.bincount(
+				candles, weights=trades['size'][rows] * (close[candles] - trades['entry_price'][rows]), minlength=n
+			)
+
+			equity = np.cumsum(cash_changes) + open_profit
+
+			# the candles before the first call of next() have the equity of the first one
+			equity[:self._start] = equity[self._start]
+			if self._out_of_money >= 0:
+				equity[self._out_of_money:] = 0
+			self._equity = equity
+
+		return self._equity
+
+	def trades_frame(self, index):
+		# closed trades as the _trades frame of Backtest.run, for compute_stats
+		trades = pd.DataFrame({
+			'Size': self.size.astype(int),
+			'EntryBar': self.entry_bar,
+			'ExitBar': self.exit_bar,
+			'EntryPrice': self.entry_price,
+			'ExitPrice': self.exit_price,
+			'PnL': self.pnl,
+			'ReturnPct': self.return_pct,
+			'EntryTime': index[self.entry_bar],
+			'ExitTime': index[self.exit_bar],
+		})
+		trades['Duration'] = trades['ExitTime'] - trades['EntryTime']
+
+		return trades
+
+
+def simulate(
+		data, entries, exits=None, short_entries=None, sl=None, tp=None, start=1, flat_entries=False, *,
+		cash=10_000, commission=.0, margin=1., trade_on_close=False, size=FULL_EQUITY, jit=True
+):
+	"""
+	Simulate the market orders of signal arrays, with the order filling rules of backtesting.py.
+
+	On every candle from start on, exits close the position, and entries and short_entries place buy and sell orders
+	of size (a fraction of the available margin) with the stop loss and take profit prices of sl and tp for that
+	candle. With flat_entries, entries are only taken when there is no open trade, like in strategies that check
+	`if not self.position` before buying. Orders are filled on the next candle.
+
+	Only the candles with a signal or with a reached SL/TP are simulated, by a loop that runs compiled by numba when
+	it is available, and over python lists otherwise. Returns a Simulation with the trades and the equity curve.
+	"""
+	n = len(data)
+	ohlc = [data[column].to_numpy(dtype=np.float64) for column in ['Open', 'High', 'Low', 'Close']]
+
+	entries = np.asarray(entries, dtype=bool)
+	exits = np.zeros(n, dtype=bool) if exits is None else np.asarray(exits, dtype=bool)
+	short_entries = np.zeros(n, dtype=bool) if short_entries is None else np.asarray(short_entries, dtype=bool)
+
+	# as in Strategy.buy(), a SL or TP of 0 is no SL or TP
+	sl, tp = (np.full(n, np.nan) if prices is None else np.asarray(prices, dtype=np.float64) for prices in (sl, tp))
+	sl, tp = (np.where(prices == 0, np.nan, np.broadcast_to(prices, n)) for prices in (sl, tp))
+
+	# next candle with a signal that acts when flat, and when in position
+	any_entry = entries | short_entries
+	next_flat_signal = _next_true(any_entry)
+	next_position_signal = _next_true(exits if flat_entries else exits | any_entry)
+
+	# every candle opens at most a trade per order, and the reduction of an opposite trade closes a copy of it
+	capacity = 4 * int(np.count_nonzero(any_entry)) + 1
+	trades = tuple(np.full(capacity, np.nan) for _ in TRADE_COLUMNS)
+	open_rows = np.zeros(capacity, dtype=np.int64)
+
+	arrays = [*ohlc, entries, exits, short_entries, sl, tp, next_flat_signal, next_position_signal]
+	settings = [
+		int(start), bool(flat_entries), float(cash), float(commission), 1 / margin, bool(trade_on_close), float(size)
+	]
+
+	loop = compiled(_simulate_loop) if jit else None
+
+	if start >= n:
+		n_trades, invalid, out_of_money = 0, -1, -1
+	elif loop is not None:
+		n_trades, invalid, out_of_money = loop(*arrays, *settings, trades, open_rows)
+	else:
+		lists = tuple(column.tolist() for column in trades)
+		array_lists = [array.tolist() for array in arrays]
+		n_trades, invalid, out_of_money = _simulate_loop(*array_lists, *settings, lists, open_rows.tolist())
+		trades = tuple(np.array(column, dtype=np.float64) for column in lists)
+
+	if invalid >= 0:
+		_raise_invalid_order(invalid, entries, short_entries, ohlc[3], sl, tp, commission)
+
+	columns = {name: column[:n_trades] for name, column in zip(TRADE_COLUMNS, trades)}
+
+	return Simulation(columns, ohlc[3], start, cash, out_of_money)
+
+
+def _raise_invalid_order(candle, entries, short_entries, close, sl, tp, commission):
+	order_sl, order_tp = (None if np.isnan(prices[candle]) else float(prices[candle]) for prices in (sl, tp))
+
+	if entries[candle]:
+		price = close[candle] * (1 + math.copysign(commission, 1))
+		if not (order_sl or -np.inf) < price < (order_tp or np.inf):
+			raise ValueError(f"Long orders require: SL ({order_sl}) < LIMIT ({price}) < TP ({order_tp})")
+
+	price = close[candle] * (1 + math.copysign(commission, -1))
+	raise ValueError(f"Short orders require: TP ({order_tp}) < LIMIT ({price}) < SL ({order_sl})")
+
+
+class VectorizedBacktest:
+	"""
+	Fast replacement of backtesting.Backtest for strategies that implement signals(): a classmethod returning the
+	entry and exit arrays of their next() method, as keyword arguments of simulate(). Strategies with a state that does
+	not fit in signal arrays implement bar_loop() instead, returning the arguments of helpers.bar_loop.run_bar_loop.
+
+	run() returns the statistics of Backtest.run, trade for trade. optimize() computes the maximized statistic
+	directly from the arrays of every run, and the full statistics only for the best parameters.
+	"""
+
+	def __init__(self, data, strategy, *, cash=10_000, commission=.0, margin=1., trade_on_close=False, jit=True):
+		if not hasattr(strategy, 'signals') and not hasattr(strategy, 'bar_loop'):
+			raise Exception(
+				f"{strategy.__name__} has no signals() or bar_loop() method, so it cannot be backtested vectorized"
+			)
+
+		self._data = data
+		self._strategy = strategy
+		self._settings = {
+			'cash': cash, 'commission': commission, 'margin': margin, 'trade_on_close': trade_on_close, 'jit': jit
+		}
+		self._day_ends = None
+		self._annual_trading_days = None
+
+	def simulate(self, **params):
+		if not hasattr(self._strategy, 'signals'):
+			from helpers.bar_loop import run_bar_loop
+
+			return run_bar_loop(self._data, **self._strategy.bar_loop(self._data, **params), **self._settings)
+
+		signals = self._strategy.signals(self._data, **params)
+
+		return simulate(self._data, **signals, **self._settings)
+
+	def run(self, **params):
+		simulation = self.simulate(**params)
+
+		stats = compute_stats(
+			trades=simulation.trades_frame(self._data.index), equity=simulation.equity(), ohlc_data=self._data,
+			strategy_instance=None
+		)
+		stats.loc['_strategy'] = self._strategy.__name__ + (f"({params})" if params else '')
+
+		return stats
+
+	def optimize(self, *, maximize='SQN', constraint=None, return_heatmap=False, **params):
+		names = list(params)
+		values = [value if isinstance(value, (list, tuple, range, np.ndarray)) else [value] for value in params.values()]
+		combinations = [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+		if constraint is not None:
+			combinations = [combination for combination in combinations if constraint(SimpleNamespace(**combination))]
+
+		if not combinations:
+			raise Exception("No admissible parameter combinations to test")
+
+		heatmap = pd.Series(
+			[self._statistic(maximize, self.simulate(**combination)) for combination in combinations],
+			index=pd.MultiIndex.from_tuples([tuple(combination.values()) for combination in combinations], names=names),
+			name=maximize if isinstance(maximize, str) else maximize.__name__, dtype=float
+		)
+
+		if heatmap.isna().all():
+			raise Exception("No admissible parameter combinations to test")
+
+		stats = self.run(**combinations[int(np.nanargmax(heatmap.to_numpy()))])
+
+		return (stats, heatmap) if return_heatmap else stats
+
+	def statistic(self, maximize='SQN', **params):
+		# value of the maximized statistic of a single run, as optimize() computes it
+		return self._statistic(maximize, self.simulate(**params))
+
+	def _statistic(self, maximize, simulation):
+		# value of the maximized statistic, computed from the arrays when possible
+		if isinstance(maximize, str) and maximize in FAST_STATS and isinstance(self._data.index, pd.DatetimeIndex):
+			return FAST_STATS[maximize](self, simulation)
+
+		stats = compute_stats(
+			trades=simulation.trades_frame(self._data.index), equity=simulation.equity(), ohlc_data=self._data,
+			strategy_instance=None
+		)
+
+		return maximize(stats) if callable(maximize) else stats[maximize]
+
+	def _annualized(self, simulation):
+		# annualized return and volatility, from the daily returns of the equity curve as in compute_stats
+		if self._day_ends is None:
+			index = self._data.index
+			days = index.normalize()
+			self._day_ends = np.flatnonzero(np.r_[days[1:] != days[:-1], True])
+			self._annual_trading_days = float(365 if index.dayofweek.to_series().between(5, 6).mean() > 2/7 * .6 else 252)
+
+		day_equity = simulation.equity()[self._day_ends]
+		day_returns = pd.Series(np.r_[np.nan, day_equity[1:] / day_equity[:-1] - 1])
+
+		gmean_day_return = geometric_mean(day_returns)
+		days = self._annual_trading_days
+		annualized_return = (1 + gmean_day_return)**days - 1
+		volatility = np.sqrt((day_returns.var(ddof=1) + (1 + gmean_day_return)**2)**days - (1 + gmean_day_return)**(2*days))
+
+		return day_returns, annualized_return, volatility
+
+
+def _max_drawdown(simulation):
+	equity = simulation.equity()
+	return -np.nan_to_num((1 - equity / np.maximum.accumulate(equity)).max())
+
+
+def _return(simulation):
+	equity = simulation.equity()
+	return (equity[-1] - equity[0]) / equity[0] * 100
+
+
+def _exposure(simulation):
+	have_position = np.zeros(len(simulation._close) + 1, dtype=int)
+	np.add.at(have_position, simulation.entry_bar, 1)
+	np.add.at(have_position, simulation.exit_bar + 1, -1)
+
+	return (np.cumsum(have_position[:-1]) > 0).mean() * 100
+
+
+def _sharpe(backtest, simulation):
+	_, annualized_return, volatility = backtest._annualized(simulation)
+	return np.clip(annualized_return * 100 / (volatility * 100 or np.nan), 0, np.inf)
+
+
+def _sortino(backtest, simulation):
+	day_returns, annualized_return, _ = backtest._annualized(simulation)
+	downside = np.sqrt(np.mean(day_returns.clip(-np.inf, 0)**2)) * np.sqrt(backtest._annual_trading_days)
+	return np.clip(annualized_return / downside, 0, np.inf)
+
+
+def _calmar(backtest, simulation):
+	_, annualized_return, _ = backtest._annualized(simulation)
+	return np.clip(annualized_return / (-_max_drawdown(simulation) or np.nan), 0, np.inf)
+
+
+def _mean(values):
+	return values.mean() if len(values) else np.nan
+
+
+def _max(values):
+	return values.max() if len(values) else np.nan
+
+
+def _sqn(simulation):
+	if len(simulation) < 2:
+		return np.nan
+
+	pnl = simulation.pnl
+	return np.sqrt(len(pnl)) * pnl.mean() / (pnl.std(ddof=1) or np.nan)
+
+
+def _profit_factor(simulation):
+	returns = simulation.return_pct
+	return returns[returns > 0].sum() / (abs(returns[returns < 0].sum()) or np.nan)
+
+
+def _avg_trade(simulation):
+	returns = simulation.return_pct + 1
+	if np.any(returns <= 0):
+		return 0
+	return (np.exp(np.log(returns).sum() / (len(returns) or np.nan)) - 1) * 100
+
+
+# statistics of compute_stats that optimize() computes directly from the arrays of a Simulation
+FAST_STATS = {
+	'Equity Final [$]': lambda backtest, simulation: simulation.equity()[-1],
+	'Equity Peak [$]': lambda backtest, simulation: simulation.equity().max(),
+	'Return [%]': lambda backtest, simulation: _return(simulation),
+	'Exposure Time [%]': lambda backtest, simulation: _exposure(simulation),
+	'Return (Ann.) [%]': lambda backtest, simulation: backtest._annualized(simulation)[1] * 100,
+	'Volatility (Ann.) [%]': lambda backtest, simulation: backtest._annualized(simulation)[2] * 100,
+	'Sharpe Ratio': _sharpe,
+	'Sortino Ratio': _sortino,
+	'Calmar Ratio': _calmar,
+	'Max. Drawdown [%]': lambda backtest, simulation: _max_drawdown(simulation) * 100,
+	'# Trades': lambda backtest, simulation: len(simulation),
+	'Win Rate [%]': lambda backtest, simulation: _mean(simulation.pnl > 0) * 100,
+	'Best Trade [%]': lambda backtest, simulation: _max(simulation.return_pct) * 100,
+	'Worst Trade [%]': lambda backtest, simulation: -_max(-simulation.return_pct) * 100,
+	'Avg. Trade [%]': lambda backtest, simulation: _avg_trade(simulation),
+	'Profit Factor': lambda backtest, simulation: _profit_factor(simulation),
+	'Expectancy [%]': lambda backtest, simulation: _mean(simulation.return_pct) * 100,
+	'SQN': lambda backtest, simulation: _sqn(simulation),
+}
@@ -1,22 +1,262 @@
-import yfinance as yf
 import datetime
+import itertools
+import multiprocessing
+import os
+import numpy as np
 import pandas as pd
 from backtesting import Backtest
+from backtesting.backtesting import Order, Trade
+from backtesting._stats import compute_stats
+
+from helpers.functions import get_ohlc_data, get_ohlc_panel
+from helpers.mmap_store import MmapOhlcStore, read_ohlc_chunks
+from helpers.result_store import storable
+from helpers.search import SEARCHES, backtest_objective
+from helpers.vectorized import VectorizedBacktest
+
+
+def _chunk_strategy(strategy, n_warmup):
+	# subclass of the strategy that does not trade on the first n_warmup bars, used only to warm up its indicators
+	def next(self):
+		if len(self.data) > n_warmup:
+			strategy.next(self)
+
+	return type(strategy.__name__, (strategy,), {'next': next})
+
+
+def _carry_strategy(strategy, n_warmup, n_bars, carried, offset):
+	# subclass of the strategy for a chunk of n_bars bars of run_chunked_backtests. It does not trade on the first
+	# n_warmup bars, reopens the trades and orders carried over from the previous chunk on the last of them, and keeps
+	# its state and the one of its broker in carry on its last bar, before backtesting.py closes its trades.
+	def next(self):
+		if len(self.data) > n_warmup:
+			strategy.next(self)
+		elif len(self.data) == n_warmup:
+			_reopen(self, carried, offset)
+			self.reopened = True
+
+		if len(self.data) == n_bars:
+			broker = self._broker
+			self.carry = {
+				'cash': broker._cash,
+				'equity': broker.equity,
+				'n_closed': len(broker.closed_trades),
+				'trades': list(broker.trades),
+				'orders': list(broker.orders),
+				'state': _plain_state(self),
+			}
+
+	return type(strategy.__name__, (strategy,), {'next': next, 'reopened': False, 'carry': None})
+
+
+def _plain_state(strategy):
+	# attributes the strategy set on itself that hold a plain value, such as a price waiting for an entry. Indicators
+	# and containers, which may refer to bars or orders of the chunk, are left out.
+	return {
+		name: value for name, value in vars(strategy).items()
+		if not name.startswith('_') and name not in ['reopened', 'carry'] and
+		isinstance(value, (type(None), bool, int, float, str))
+	}
+
+
+def _carried_entry(trade, offset):
+	# (bar, time) of the entry of a trade, for the whole history: trades reopened in a chunk keep their original one
+	return getattr(trade, 'carried_entry', None) or (trade.entry_bar + offset, trade.entry_time)
+
+
+def _carried(carry, offset):
+	# trades and orders open at the end of a chunk, as plain values, the orders of a trade referring to its position
+	trades = carry['trades']
+
+	return {
+		'trades': [(trade.size, trade.entry_price, _carried_entry(trade, offset)) for trade in trades],
+		'orders': [
+			(order.size, order.limit, order.stop, order.sl, order.tp,
+			 None if order.parent_trade is None else trades.index(order.parent_trade))
+			for order in carry['orders']
+		],
+		'state': carry['state'],
+	}
+
+
+def _reopen(strategy, carried, offset):
+	# restore the carried state of the strategy, and open the carried trades and orders on the broker of the next
+	# chunk. Trades that were entered before the chunk are given its first bar, and their actual entry in carried_entry.
+	broker = strategy._broker
+	trades = []
+
+	for name, value in carried['state'].items():
+		setattr(strategy, name, value)
+
+	for size, entry_price, (entry_bar, entry_time) in carried['trades']:
+		trade = Trade(broker, size, entry_price, max(0, entry_bar - offset))
+		trade.carried_entry = (entry_bar, entry_time)
+		trades.append(trade)
+
+	broker.trades.extend(trades)
+
+	for size, limit, stop, sl, tp, parent in carried['orders']:
+		trade = None if parent is None else trades[parent]
+		order = Order(broker, size, limit, stop, sl, tp, trade)
+		broker.orders.append(order)
+
+		# contingent orders are the stop-loss (a stop order) or the take-profit (a limit order) of their trade
+		if trade is not None:
+			trade._replace(**{'sl_order' if stop is not None else 'tp_order': order})
+
+
+# OHLC data of the worker processes of the parallel backtests, by ticker, set once per worker by _init_worker
+_worker_data = {}
+
+
+def _init_worker(datas):
+	_worker_data.update(datas)
+
+
+def _run_backtest(job):
+	# run one (ticker, strategy, params) job on the data of the worker, and return only the requested metrics, or all
+	# the statistics when metrics is None
+	ticker, strategy, params, metrics = job
+	stats = Backtest(_worker_data[ticker], strategy, cash=10_000).run(**params)
+
+	if metrics is None:
+		return storable(stats)
+
+	return {metric: stats[metric] for metric in metrics}
+
+
+def _best_params(data, strategy, grid, maximize):
+	# parameters of the grid that maximize the statistic on data, found by VectorizedBacktest when the strategy supports
+	# it. The combinations are run one after another, as the jobs themselves run in parallel.
+	if hasattr(strategy, 'signals') or hasattr(strategy, 'bar_loop'):
+		_, heatmap = VectorizedBacktest(data, strategy, cash=10_000).optimize(
+			maximize=maximize, return_heatmap=True, **grid
+		)
+		return dict(zip(heatmap.index.names, heatmap.idxmax()))
+
+	names = list(grid)
+	best, best_value = None, np.nan
+
+	for combination in itertools.product(*(values if type(values) is list else [values] for values in grid.values())):
+		params = dict(zip(names, combination))
+		stats = Backtest(data, strategy, cash=10_000).run(**params)
+		value = maximize(stats) if callable(maximize) else stats[maximize]
+
+		if best is None or value > best_value or (np.isnan(best_value) and not np.isnan(value)):
+			best, best_value = params, value
+
+	return best
+
+
+def _warmed_up_stats(data, strategy, params, n_warmup):
+	# statistics of the candles of data after the first n_warmup ones, which only warm up the indicators
+	stats = Backtest(data, _chunk_strategy(strategy, n_warmup), cash=10_000).run(**params)
+
+	trades = stats._trades.copy()
+	trades[['EntryBar', 'ExitBar']] -= n_warmup
+
+	return compute_stats(
+		trades=trades,
+		equity=stats._equity_curve.Equity.to_numpy()[n_warmup:],
+		ohlc_data=data.iloc[n_warmup:],
+		strategy_instance=None
+	)
+
+
+def _run_window(job):
+	# optimize the strategy on the train candles of a walk-forward window and evaluate it on the test ones, which
+	# follow them. The train candles also warm up the indicators of the test run.
+	ticker, strategy, grid, params, maximize, (train_start, test_start, test_end), metrics = job
+	data = _worker_data[ticker]
+
+	if grid is not None:
+		params = _best_params(data.iloc[train_start:test_start], strategy, grid, maximize)
+	stats = _warmed_up_stats(data.iloc[train_start:test_end], strategy, params, test_start - train_start)
+
+	if metrics is None:
+		return {'params': params, 'stats': stats}
+
+	return {'params': params} | {metric: stats[metric] for metric in metrics}
+
+
+def _walk_forward_windows(index, train_period, test_period, anchored):
+	# (train start, test start, test end) candle positions of every window. Test windows follow each other and span a
+	# whole test_period: a last window that runs past the data, which ends one candle after its last one, is dropped,
+	# since a few candles make no trade. Rolling train windows span train_period, anchored ones start with the data.
+	windows = []
+	test_start_time = index[0] + train_period
+	data_end = index[-1] + (index[-1] - index[-2] if len(index) > 1 else pd.Timedelta(0))
 
-from strategies.baseline.buy_and_hold.buy_and_hold import BuyAndHold
-from strategies.trend_following.max_min.max_min import MaxMin as MaxMin
-from strategies.trend_following.max_min.filtered_max_min import MaxMin as MaxMinFilt
-from helpers.functions import get_ohlc_data
+	while test_start_time + test_period <= data_end:
+		train_start = 0 if anchored else index.searchsorted(test_start_time - train_period)
+		test_start = index.searchsorted(test_start_time)
+		test_end = index.searchsorted(test_start_time + test_period)
+
+		# no window where a gap in the data spans the whole test period
+		if test_end > test_start:
+			windows.append((int(train_start), int(test_start), int(test_end)))
+
+		test_start_time += test_period
+
+	return windows
+
+
+def _run_jobs(datas, function, jobs, processes, store=None, keys=None):
+	# results of function on every job, in order. With processes other than 1 (None for one per core) the jobs run on
+	# a process pool, whose workers receive the data once, when they start. With a result store, the jobs whose key is
+	# stored are not run again, and the others are stored as they finish, so that an interrupted run resumes.
+	rows = [None] * len(jobs) if store is None else [store.get(key) for key in keys]
+	pending = [i for i, row in enumerate(rows) if row is None]
+	processes = min(processes or os.cpu_count(), len(pending))
+
+	def collect(results):
+		for i, row in zip(pending, results):
+			rows[i] = row
+			if store is not None:
+				store.put(keys[i], row)
+
+	if processes <= 1:
+		_init_worker(datas)
+		collect(function(jobs[i]) for i in pending)
+		_worker_data.clear()
+	else:
+		with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(datas,)) as pool:
+			collect(pool.imap(function, [jobs[i] for i in pending], chunksize=1))
+
+	return rows
+
+
+def _run_params(params):
+	# parameters a strategy is run with: fixed values, as left by optimize(), and single values given as lists. Lists
+	# of several values that were never optimized are left to the strategy defaults.
+	run_params = {}
+
+	for param, values in params.items():
+		if type(values) is not list:
+			run_params[param] = values
+		elif len(values) == 1:
+			run_params[param] = values[0]
+
+	return run_params
 
 
 class StrategyTester:
-	def __init__(self):
+	def __init__(self, provider=None, result_store=None):
 		self.strategies = []
 		self._strategy_params = []
 		self._optimize_strategies = []
 
 		self.train_data = None
 
+		# SearchResult of every strategy optimized by a budgeted search, by strategy name
+		self.search_results = {}
+
+		# OhlcProvider used to retrieve the data (None for the get_ohlc_data default)
+		self.provider = provider
+
+		# ResultStore of the backtests already run (None to always run them)
+		self.result_store = result_store
+
 	def add_strategies(self, strategies):
 		if not type(strategies) is list:
 			raise Exception(f"Please, provide a list object, and not a {type(strategies)} object")
@@ -31,7 +271,7 @@ class StrategyTester:
 		# containing both the Strategy objects and the parameters to be optimized
 		for i, strategy in enumerate(strategies):
 			if type(strategy) is tuple:
-				if not ((len(strategies) == 2) and (type(strategy[1]) is dict)):
+				if not ((len(strategy) == 2) and (type(strategy[1]) is dict)):
 					raise Exception(f"Please, provide a valid list object")
 
 				# save strategy object
@@ -56,7 +296,7 @@ class StrategyTester:
 	def optimize(self, optimization_info):
 		if not optimization_info:
 			raise Exception(f"No optimization instructions were provided")
-		elif [*optimization_info.keys()] != ['data_info', 'maximize'] or \
+		elif [*optimization_info.keys()] not in [['data_info', 'maximize'], ['data_info', 'maximize', 'search']] or \
 				[*optimization_info['data_info']] != ['ticker', 'start_date', 'end_date', 'interval']:
 			raise Exception(f"Missing information for ohlc data retrieval."
 							f"\nRequired info is (Stock Sticker, Start Data, End Date, timeframe)")
@@ -70,30 +310,270 @@ class StrategyTester:
 			data_info['ticker'],
 			data_info['start_date'],
 			data_info['end_date'],
-			data_info['interval']
+			data_info['interval'],
+			provider=self.provider
 		)
 
+		# optional budgeted search instead of the exhaustive grid, e.g. {'method': 'tpe', 'max_evals': 200}, where the
+		# other entries are passed to the search function of helpers/search.py
+		search = dict(optimization_info.get('search') or {})
+		method = search.pop('method', None)
+		if method is not None and method not in SEARCHES:
+			raise Exception(f"Unknown search method: {method}. Use one of {[*SEARCHES]}")
+
 		for i, strategy in enumerate(self.strategies):
-			if self._optimize_strategies[i]:
-				bt = Backtest(opt_data, strategy, cash=10_000)
-				stats = bt.optimize(**(self._strategy_params[i] | {'maximize': optimization_info['maximize']}))
+			if self._optimize_strategies[i] and method is not None:
+				objective = backtest_objective(strategy, optimization_info['maximize'], store=self.result_store)
+				result = SEARCHES[method](objective, self._strategy_params[i], opt_data, **search)
+				self.search_results[strategy.__name__] = result
+
+				if result.best_params is None:
+					raise Exception(f"The search budget ran out before any backtest of {strategy.__name__}")
+
+				self._strategy_params[i] |= result.best_params
+			elif self._optimize_strategies[i]:
+				store = self.result_store
+				key = None if store is None else store.key(
+					strategy, self._strategy_params[i], opt_data, cash=10_000, maximize=optimization_info['maximize']
+				)
+				best_params = None if store is None else store.get(key)
+
+				if best_params is None:
+					bt = Backtest(opt_data, strategy, cash=10_000)
+					stats = bt.optimize(**(self._strategy_params[i] | {'maximize': optimization_info['maximize']}))
+					best_params = {param: getattr(stats._strategy, param) for param in self._strategy_params[i]}
+
+					if store is not None:
+						store.put(key, best_params)
+
+				self._strategy_params[i] |= best_params
+
+	def _run_backtest_jobs(self, datas, jobs, processes):
+		# metrics of the (ticker, strategy, params, metrics) jobs. With a result store, the full statistics are stored
+		# and the metrics taken from them, so that runs asking for other metrics are served from the store as well.
+		if self.result_store is None:
+			return _run_jobs(datas, _run_backtest, jobs, processes)
+
+		keys = [
+			self.result_store.key(strategy, params, datas[ticker], cash=10_000) for ticker, strategy, params, _ in jobs
+		]
+		stats = _run_jobs(datas, _run_backtest, [job[:3] + (None,) for job in jobs], processes, self.result_store, keys)
+
+		return [{metric: run_stats[metric] for metric in job[3]} for run_stats, job in zip(stats, jobs)]
+
+	def run_backtests(self, data_info, metrics, processes=1):
+		"""
+		Backtest every strategy, with its parameters, on the data of data_info, and return the metrics of each one as a
+		row of a data frame. With processes other than 1 (None for one per core), the strategies run on a process
+		pool: the data is sent once to each worker, and only the metrics come back.
+		"""
+		bt_data = get_ohlc_data(
+			data_info['ticker'],
+			data_info['start_date'],
+			data_info['end_date'],
+			data_info['interval'],
+			provider=self.provider
+		)
 
-				for param in self._strategy_params[i]:
-					self._strategy_params[i][param] = getattr(stats._strategy, param)
+		ticker = data_info['ticker']
+		jobs = [
+			(ticker, strategy, _run_params(params), metrics)
+			for strategy, params in zip(self.strategies, self._strategy_params)
+		]
+		rows = self._run_backtest_jobs({ticker: bt_data}, jobs, processes)
+
+		return pd.DataFrame(rows, columns=metrics, index=[strategy.__name__ for strategy in self.strategies])
+
+	def run_grid(self, tickers, data_info, metrics, processes=1):
+		"""
+		Backtest every strategy on every ticker, over the dates and interval of data_info (its ticker is ignored). Each
+		ticker is loaded once, and the (ticker, strategy) cells are run as in run_backtests. Returns a tidy frame with a
+		single 'value' column and a (ticker, strategy, metric) index. Tickers whose data cannot be loaded are reported
+		and left out.
+		"""
+		panel, errors = get_ohlc_panel(
+			tickers,
+			data_info['start_date'],
+			data_info['end_date'],
+			data_info['interval'],
+			provider=self.provider,
+			how='outer'
+		)
 
-	def run_backtests(self, data_info, metrics):
-		bt_data = get_ohlc_data(
+		for ticker, error in errors.items():
+			print(f"Skipping {ticker}: {error}")
+
+		# dates the ticker was not traded on are the ones the outer calendar added
+		tickers = [ticker for ticker in tickers if ticker not in errors]
+		datas = {ticker: panel[ticker].dropna(how='all') for ticker in tickers}
+		del panel
+
+		jobs = [
+			(ticker, strategy, _run_params(params), metrics)
+			for ticker in tickers
+			for strategy, params in zip(self.strategies, self._strategy_params)
+		]
+		rows = self._run_backtest_jobs(datas, jobs, processes)
+
+		index = pd.MultiIndex.from_tuples(
+			[(ticker, strategy.__name__, metric) for (ticker, strategy, _, _) in jobs for metric in metrics],
+			names=['ticker', 'strategy', 'metric']
+		)
+
+		return pd.DataFrame({'value': [row[metric] for row in rows for metric in metrics]}, index=index)
+
+	def walk_forward(self, data_info, maximize, train_period, test_period, metrics, anchored=False, processes=1):
+		"""
+		Walk-forward analysis of every strategy on the data of data_info. The history is split into consecutive test
+		windows of test_period, each preceded by a train window: the train_period before it (rolling), or all the
+		history before it (anchored). A last test window that would run past the data is dropped. The list-valued parameters of the strategies are optimized on every train window,
+		maximizing the maximize statistic, and the best ones are evaluated on the following test window. Strategies
+		without parameters to optimize are run on the test windows as they are.
+
+		The data is loaded once, and the (window, strategy) jobs run on processes as in run_backtests. Returns a frame
+		indexed by (strategy, window), with the window dates, the chosen parameters and the metrics of the test window.
+		"""
+		data = get_ohlc_data(
 			data_info['ticker'],
 			data_info['start_date'],
 			data_info['end_date'],
-			data_info['interval']
+			data_info['interval'],
+			provider=self.provider
 		)
 
+		windows = _walk_forward_windows(data.index, pd.Timedelta(train_period), pd.Timedelta(test_period), anchored)
+
+		if not windows:
+			raise Exception(
+				f"The data of {data_info['ticker']} is too short for a train period of {train_period} and a test period "
+				f"of {test_period}"
+			)
+
+		ticker = data_info['ticker']
+		jobs = []
+
+		for strategy, params, optimize in zip(self.strategies, self._strategy_params, self._optimize_strategies):
+			grid = params if optimize else None
+			jobs += [(ticker, strategy, grid, _run_params(params), maximize, window, metrics) for window in windows]
+
+		if self.result_store is None:
+			rows = _run_jobs({ticker: data}, _run_window, jobs, processes)
+		else:
+			keys = [
+				self.result_store.key(
+					strategy, {'grid': grid, 'params': params}, data.iloc[train_start:test_end], cash=10_000,
+					maximize=maximize, n_warmup=test_start - train_start
+				)
+				for _, strategy, grid, params, maximize, (train_start, test_start, test_end), _ in jobs
+			]
+			results = _run_jobs(
+				{ticker: data}, _run_window, [job[:6] + (None,) for job in jobs], processes, self.result_store, keys
+			)
+			rows = [{'params': result['params']} | {metric: result['stats'][metric] for metric in metrics}
+					for result in results]
+
+		index = data.index
+		results = pd.DataFrame(rows, columns=['params'] + metrics)
+		results.insert(0, 'train_start', [index[job[5][0]] for job in jobs])
+		results.insert(1, 'test_start', [index[job[5][1]] for job in jobs])
+		results.insert(2, 'test_end', [index[job[5][2] - 1] for job in jobs])
+		results.index = pd.MultiIndex.from_tuples(
+			[(strategy.__name__, window) for strategy in self.strategies for window in range(len(windows))],
+			names=['strategy', 'window']
+		)
+
+		return results
+
+	def run_chunked_backtests(self, data_info, metrics, chunk_size, warmup, store=None):
+		"""
+		Run the backtests over the binary store in chunks of chunk_size bars, so that memory stays bounded for long
+		intraday histories. Each chunk is preceded by warmup bars (at least the longest indicator lookback), on which
+		no trades are made.
+
+		The cash, open trades, pending orders and the plain attributes of the strategy (numbers, strings and None) at
+		the end of a chunk are carried over to the next one. The results are then those of a single backtest over the
+		whole history, as long as the warmup bars give the indicators their values (recursive ones, such as ema, only
+		converge to them) and the strategy keeps no other state, such as a list of the bars its orders were placed on.
+		"""
+		if store is None:
+			store = MmapOhlcStore(source=self.provider)
+
 		results = pd.DataFrame(columns=metrics, index=[strat.__name__ for strat in self.strategies])
 
 		for strategy in self.strategies:
-			bt = Backtest(bt_data, strategy, cash=10_000)
-			stats = bt.run()
+			cash = 10_000
+			index, close, equity, trades = [], [], [], []
+			n_bars = 0
+
+			chunks = read_ohlc_chunks(
+				data_info['ticker'],
+				data_info['start_date'],
+				data_info['end_date'],
+				data_info['interval'],
+				chunk_size,
+				warmup,
+				store=store
+			)
+
+			carried = {'trades': [], 'orders': [], 'state': {}}
+			chunk, n_warmup = next(chunks)
+
+			while chunk is not None:
+				offset = n_bars - n_warmup
+				bt = Backtest(chunk, _carry_strategy(strategy, n_warmup, len(chunk), carried, offset), cash=cash)
+				stats = bt.run()
+				strategy_instance = stats._strategy
+
+				if (carried['trades'] or carried['orders']) and not strategy_instance.reopened:
+					raise Exception(
+						f"{strategy.__name__} did not run on the last of the {n_warmup} warmup bars, to reopen its "
+						f"positions. Increase the warmup to the longest lookback of its indicators"
+					)
+
+				next_chunk, next_warmup = next(chunks, (None, 0))
+				carry = strategy_instance.carry
+				chunk_equity = stats._equity_curve.Equity.to_numpy()[n_warmup:]
+
+				if next_chunk is None or carry is None:
+					# the last chunk is kept whole, with its open trades closed on the last bar, as in a single backtest
+					n_closed = len(stats._trades)
+				else:
+					# backtesting.py closes the open trades at the end of the chunk: keep the equity and trades of
+					# before, and carry the open ones over to the next chunk
+					n_closed = carry['n_closed']
+					chunk_equity[-1] = carry['equity']
+					cash = carry['cash']
+					carried = _carried(carry, offset)
+
+				# keep only what the final statistics need, dropping the warmup bars
+				index.append(chunk.index[n_warmup:])
+				close.append(chunk.Close.to_numpy()[n_warmup:])
+				equity.append(chunk_equity)
+
+				chunk_trades = stats._trades.iloc[:n_closed].copy()
+				chunk_trades['ExitBar'] += offset
+
+				if n_closed:
+					entries = [_carried_entry(trade, offset) for trade in strategy_instance.closed_trades[:n_closed]]
+					chunk_trades['EntryBar'] = [bar for bar, _ in entries]
+					chunk_trades['EntryTime'] = [time for _, time in entries]
+					chunk_trades['Duration'] = chunk_trades.ExitTime - chunk_trades.EntryTime
+
+				trades.append(chunk_trades)
+
+				n_bars += len(chunk) - n_warmup
+				chunk, n_warmup = next_chunk, next_warmup
+
+			# backtesting.py returns the trades of a chunk without any as a float frame
+			trades = pd.concat([frame for frame in trades if len(frame)] or trades, ignore_index=True)
+			trades = trades.astype({'Size': int, 'EntryBar': int, 'ExitBar': int})
+
+			stats = compute_stats(
+				trades=trades,
+				equity=np.concatenate(equity),
+				ohlc_data=pd.DataFrame({'Close': np.concatenate(close)}, index=index[0].append(index[1:])),
+				strategy_instance=None
+			)
 
 			results.loc[strategy.__name__] = {metric: stats[metric] for metric in metrics}
 
@@ -101,6 +581,10 @@ class StrategyTester:
 
 
 if __name__ == "__main__":
+	from strategies.baseline.buy_and_hold.buy_and_hold import BuyAndHold
+	from strategies.trend_following.max_min.max_min import MaxMin as MaxMin
+	from strategies.trend_following.max_min.filtered_max_min import MaxMin as MaxMinFilt
+
 	# Define the ticker symbol and the time period you're interested in
 	ticker_ = 'AAPL'  # Example: Apple Inc.
 	ticker_ = 'ABEV3.SA'  # Example: Apple Inc.
@@ -1,6 +1,5 @@
 from backtesting import Backtest, Strategy
 from backtesting.lib import crossover
-from backtesting.test import GOOG  # Using Google's stock data as an example
 import numpy as np
 
 from helpers.indicators import bbands
@@ -21,6 +20,8 @@ class RandomStrategy(Strategy):
 
 
 if __name__ == '__main__':
+	from backtesting.test import GOOG  # Using Google's stock data as an example
+
 	# Setup and run the backtest
 	bt = Backtest(GOOG, RandomStrategy, cash=10_000, commission=.002)
 
@@ -1,33 +1,28 @@
 #! C:\Users\Asus\Desktop\prog\algo-trading\venv\Scripts\python.exe
 
-import sys
-import os
-
-# Construct the path to the root directory
-root_path = os.path.abspath(
-	os.path.join(os.path.dirname(__file__), '../..', '..')
-)
-
-# Append the path to sys.path only if it is not already included
-if root_path not in sys.path:
-	sys.path.append(root_path)
-
 from backtesting import Strategy
 from backtesting import Backtest
 from backtesting.lib import crossover
-from backtesting.test import GOOG
+from collections import deque
 import datetime
 
-from helpers.indicators import sma, rsi, bbands
+from helpers.bar_loop import CANCEL, CLOSE_TRADES, CLOSE_LAST_TRADE, SIZE, LIMIT, SL
+from helpers.indicators import sma, rsi, bbands, streak
+from helpers.vectorized import indicator_start, strategy_params
+
+DAY = 86_400_000_000_000  # [ns]
+
+# rows of the indicators of bar_loop()
+SMA, RSI, LOWER_BAND, UPPER_BAND, LOW_ABOVE_SMA, HIGH_BELOW_SMA = range(6)
 
 
 class BBandRsi(Strategy):
 	"""
 	Entry Criteria:
-	- Buy Signal: Price closes below the lower Bollinger Band after at least 6 consecutive days where the daily low is
-	above the 200-day SMA.
-	- Sell Signal: Price closes above the upper Bollinger Band after at least 6 consecutive days where the daily high is
-	below the 200-day SMA.
+	- Buy Signal: Price closes below the lower Bollinger Band after at least 6 (sma_streak) consecutive days where the
+	daily low is above the 200-day SMA.
+	- Sell Signal: Price closes above the upper Bollinger Band after at least 6 (sma_streak) consecutive days where the
+	daily high is below the 200-day SMA.
 
 	Exit Criteria:
 	- A trade is exited if it exceeds 10 days in duration or if RSI crosses above 70 (for longs) or drops below
@@ -45,6 +40,7 @@ class BBandRsi(Strategy):
 	bbands_std = 2.5         # standard deviations
 
 	# strategy parameters
+	sma_streak = 6           # minimum run of candles with the low above (high below) the SMA before a signal [candles]
 	order_time_max = 5       # maximum duration of an active order [days]
 	trade_time_max = 10      # maximum duration of a trade [days]
 	rsi_upper_limit = 70     # RSI upper limit for keeping a long [%]
@@ -54,41 +50,31 @@ class BBandRsi(Strategy):
 	buy_limit_offset = 0     # Distance btw the candle close and the buy order limit [% of close]
 	sell_limit_offset = 0    # Distance btw the candle close and the sell order limit [% of close]
 
-	# list of datetime of the current order initialization
-	orders_datetime = []
-
 	def init(self):
 		self.sma = self.I(sma, self.data.Close, self.sma_length)
 		self.rsi = self.I(rsi, self.data.Close, self.rsi_length)
 		self.bbands = self.I(bbands, self.data.Close, self.bbands_length, self.bbands_std)
-		self.consecutive_days_above_sma = 0  # Counter for days low is above SMA
-		self.consecutive_days_below_sma = 0  # Counter for days high is below SMA
+		# number of consecutive days the low is above (the high is below) the SMA
+		self.days_above_sma = self.I(streak, self.data.Low > self.sma, plot=False)
+		self.days_below_sma = self.I(streak, self.data.High < self.sma, plot=False)
+
+		# (candle index, order) of the orders placed by next(), oldest first
+		self.order_bars = deque()
+		self.order_duration_max = datetime.timedelta(days=self.order_time_max)
 
 	def next(self):
 		lower_band = self.bbands[0]
 		upper_band = self.bbands[2]
 
-		# Update the counter for days low is above the SMA
-		if self.data.Low[-1] > self.sma:
-			self.consecutive_days_above_sma += 1
-		else:
-			self.consecutive_days_above_sma = 0
-
-		# Update the counter for days high is below the SMA
-		if self.data.High[-1] < self.sma:
-			self.consecutive_days_below_sma += 1
-		else:
-			self.consecutive_days_below_sma = 0
-
 		# Define buying and selling conditions
-		buy_signal = self.consecutive_days_above_sma >= 6 and lower_band > self.data.Close[-1]
-		sell_signal = self.consecutive_days_below_sma >= 6 and self.data.Close[-1] > upper_band
+		buy_signal = self.days_above_sma[-1] >= self.sma_streak and lower_band > self.data.Close[-1]
+		sell_signal = self.days_below_sma[-1] >= self.sma_streak and self.data.Close[-1] > upper_band
 
-		# if an order surpasses max days active, cancel it.
-		for _ in range(0, len(self.orders)):
-			if self.data.index[-1] - self.orders_datetime[0] > datetime.timedelta(days=self.order_time_max):
-				self.orders[0].cancel()
-				self.orders_datetime.pop(0)
+		# if an order surpasses max days active, cancel it (unless it was already filled).
+		while self.order_bars and self.data.index[-1] - self.data.index[self.order_bars[0][0]] > self.order_duration_max:
+			_, order = self.order_bars.popleft()
+			if order in self.orders:
+				order.cancel()
 
 		if len(self.trades) > 0:
 			# if a trade remains open for more than the defined maximum, close it.
@@ -113,17 +99,15 @@ class BBandRsi(Strategy):
 				order_size = self.order_size / 100
 
 				# Cancel all previous orders
-				for _ in range(0, len(self.orders)):
-					self.orders[0].cancel()
-					self.orders_datetime.pop(0)
+				self.cancel_orders()
 
 				# set buy order and stop loss
-				self.buy(
+				order = self.buy(
 					limit=buy_limit,
 					sl=stop_loss,
 					size=order_size
 				)
-				self.orders_datetime.append(self.data.index[-1])
+				self.order_bars.append((len(self.data) - 1, order))
 
 			elif sell_signal:
 				sell_limit = self.data.Close[-1] * (1 - self.buy_limit_offset / 100)
@@ -131,17 +115,93 @@ class BBandRsi(Strategy):
 				order_size = self.order_size / 100
 
 				# Cancel previous orders
-				for _ in range(0, len(self.orders)):
-					self.orders[0].cancel()
-					self.orders_datetime.pop(0)
+				self.cancel_orders()
 
 				# Add new replacement order
-				self.sell(
+				order = self.sell(
 					limit=sell_limit,
 					sl=stop_loss,
 					size=order_size
 				)
-				self.orders_datetime.append(self.data.index[-1])
+				self.order_bars.append((len(self.data) - 1, order))
+
+	def cancel_orders(self):
+		# cancel the orders placed by next() that are still pending
+		for _, order in self.order_bars:
+			if order in self.orders:
+				order.cancel()
+		self.order_bars.clear()
+
+	@classmethod
+	def bar_loop(cls, data, **params):
+		# next() over arrays, for helpers.bar_loop.run_bar_loop
+		p = strategy_params(cls, params)
+		close = data.Close.to_numpy()
+
+		sma_ = sma(close, p.sma_length)
+		rsi_ = rsi(close, p.rsi_length)
+		bbands_ = bbands(close, p.bbands_length, p.bbands_std)
+		days_above_sma = streak(data.Low.to_numpy() > sma_)
+		days_below_sma = streak(data.High.to_numpy() < sma_)
+
+		# the candle of the last order (order_bars holds at most one order, as placing an order cancels the others), -1
+		# when there is none
+		state = [-1]
+
+		return {
+			'step': _bband_rsi_step,
+			'indicators': [sma_, rsi_, bbands_[0], bbands_[2], days_above_sma, days_below_sma],
+			'params': [
+				p.order_time_max, p.trade_time_max, p.rsi_upper_limit, p.rsi_lower_limit, p.order_size,
+				p.stoploss_factor, p.buy_limit_offset, p.sma_streak
+			],
+			'state': state,
+			'start': indicator_start(sma_, rsi_, bbands_),
+		}
+
+
+def _bband_rsi_step(
+		i, open_, high, low, close, times, indicators, params, state, n_orders, n_trades, trade_size, trade_entry_bar,
+		actions
+):
+	# BBandRsi.next() on candle i
+	order_time_max, trade_time_max, rsi_upper_limit, rsi_lower_limit = params[0], params[1], params[2], params[3]
+	order_size, stoploss_factor, buy_limit_offset, sma_streak = params[4], params[5], params[6], params[7]
+
+	buy_signal = indicators[LOW_ABOVE_SMA, i] >= sma_streak and indicators[LOWER_BAND, i] > close[i]
+	sell_signal = indicators[HIGH_BELOW_SMA, i] >= sma_streak and close[i] > indicators[UPPER_BAND, i]
+
+	# the order expires after order_time_max days, and is cancelled if it is still pending: when there is no trade, as
+	# orders are only placed without trades, the queue only has the pending order
+	if state[0] >= 0 and times[i] - times[int(state[0])] > order_time_max * DAY:
+		state[0] = -1
+		if n_trades == 0 and n_orders > 0:
+			actions[CANCEL] = 1
+
+	if n_trades > 0:
+		if times[i] - times[int(trade_entry_bar)] >= trade_time_max * DAY:
+			actions[CLOSE_TRADES] = CLOSE_LAST_TRADE
+
+		if trade_size > 0 and indicators[RSI, i] >= rsi_upper_limit:
+			actions[CLOSE_TRADES] = CLOSE_LAST_TRADE
+		elif trade_size < 0 and indicators[RSI, i] <= rsi_lower_limit:
+			actions[CLOSE_TRADES] = CLOSE_LAST_TRADE
+
+	elif buy_signal or sell_signal:
+		# cancel_orders()
+		actions[CANCEL] = n_orders
+
+		# as in next(), the sell limit uses buy_limit_offset
+		limit = close[i] * (1 - buy_limit_offset / 100)
+		actions[LIMIT] = limit
+		if buy_signal:
+			actions[SIZE] = order_size / 100
+			actions[SL] = limit * (1 - stoploss_factor / 100)
+		else:
+			actions[SIZE] = -order_size / 100
+			actions[SL] = limit * (1 + stoploss_factor / 100)
+
+		state[0] = i
 
 
 if __name__ == '__main__':
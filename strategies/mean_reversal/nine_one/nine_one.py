@@ -1,6 +1,9 @@
 from backtesting import Backtest, Strategy
+import numpy as np
 
+from helpers.bar_loop import CLOSE_TRADES, CLOSE_POSITION, SIZE, SL
 from helpers.indicators import ema
+from helpers.vectorized import FULL_EQUITY, indicator_start, strategy_params
 
 
 class NineOne(Strategy):
@@ -66,6 +69,59 @@ class NineOne(Strategy):
 				self.position.close()  # Exit the current position
 			self.exit_price = None  # Reset the exit price after exiting
 
+	@classmethod
+	def bar_loop(cls, data, **params):
+		# next() over arrays, for helpers.bar_loop.run_bar_loop
+		p = strategy_params(cls, params)
+		ema_ = ema(data.Close.to_numpy(), p.ema_length)
+
+		return {
+			'step': _nine_one_step,
+			'indicators': [ema_],
+			'params': [],
+			# entry_price, exit_price and low_since_entry, NaN for None
+			'state': [np.nan, np.nan, np.nan],
+			'start': indicator_start(ema_),
+		}
+
+
+def _nine_one_step(
+		i, open_, high, low, close, times, indicators, params, state, n_orders, n_trades, trade_size, trade_entry_bar,
+		actions
+):
+	# NineOne.next() on candle i
+	if i < 2:
+		return
+
+	turns_up = indicators[0, i] > indicators[0, i - 1] and indicators[0, i - 1] < indicators[0, i - 2]
+	turns_down = indicators[0, i] < indicators[0, i - 1] and indicators[0, i - 1] > indicators[0, i - 2]
+
+	if n_trades == 0:
+		if turns_up:
+			state[0] = high[i] + 0.01
+			state[2] = low[i]
+		elif indicators[0, i - 1] > indicators[0, i]:
+			state[0] = np.nan
+	elif low[i] < state[2]:
+		state[2] = low[i]
+
+	if close[i] > state[0]:
+		if n_trades == 0:
+			actions[SIZE] = FULL_EQUITY
+			actions[SL] = state[2]
+		state[0] = np.nan
+
+	if n_trades > 0:
+		if turns_down:
+			state[1] = low[i] + 0.01
+		elif indicators[0, i - 1] < indicators[0, i]:
+			state[1] = np.nan
+
+	if close[i] < state[1]:
+		if n_trades > 0:
+			actions[CLOSE_TRADES] = CLOSE_POSITION
+		state[1] = np.nan
+
 
 if __name__ == '__main__':
 	from helpers.functions import get_ohlc_data
@@ -2,6 +2,7 @@ from backtesting import Strategy
 from backtesting.lib import crossover
 from helpers.indicators import rsi
 from helpers.functions import get_ohlc_data
+from helpers.vectorized import crossover as crossover_signals, indicator_start, strategy_params
 
 
 class RsiOscillator(Strategy):
@@ -18,6 +19,20 @@ class RsiOscillator(Strategy):
 		elif crossover(self.lower_bound, self.rsi):
 			self.buy()
 
+	@classmethod
+	def signals(cls, data, **params):
+		# next() as arrays, for helpers.vectorized.VectorizedBacktest
+		p = strategy_params(cls, params)
+
+		rsi_values = rsi(data.Close.to_numpy(), p.rsi_len)
+		exits = crossover_signals(rsi_values, p.upper_bound)
+
+		return {
+			'entries': crossover_signals(p.lower_bound, rsi_values) & ~exits,
+			'exits': exits,
+			'start': indicator_start(rsi_values),
+		}
+
 
 if __name__ == "__main__":
 	from backtesting.test import GOOG
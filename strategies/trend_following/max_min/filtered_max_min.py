@@ -1,5 +1,4 @@
 from backtesting import Backtest, Strategy
-from backtesting.test import SMA, GOOG
 
 from helpers.indicators import highest, lowest, atr, sma, sma_std
 
@@ -1,7 +1,8 @@
+import numpy as np
 from backtesting import Backtest, Strategy
-from backtesting.test import SMA, GOOG
 
 from helpers.indicators import highest, lowest, atr, sma
+from helpers.vectorized import indicator_start, strategy_params
 
 
 class MaxMin(Strategy):
@@ -46,6 +47,28 @@ class MaxMin(Strategy):
 			if self.lowest[-1] == self.data.Low[-1]:
 				self.position.close()
 
+	@classmethod
+	def signals(cls, data, **params):
+		# next() as arrays, for helpers.vectorized.VectorizedBacktest
+		p = strategy_params(cls, params)
+		high, low, close = data.High.to_numpy(), data.Low.to_numpy(), data.Close.to_numpy()
+
+		highest_values = highest(high, p.highest_length)
+		lowest_values = lowest(low, p.lowest_length)
+		atr_values = atr(high, low, close, p.atr_length)
+
+		# same as max(close - 2 * atr, lowest)
+		stop_loss = close - 2 * atr_values
+		stop_loss = np.where(lowest_values > stop_loss, lowest_values, stop_loss)
+
+		return {
+			'entries': high == highest_values,
+			'exits': lowest_values == low,
+			'sl': stop_loss,
+			'start': indicator_start(highest_values, lowest_values, atr_values),
+			'flat_entries': True,
+		}
+
 
 if __name__ == '__main__':
 	from helpers.functions import get_ohlc_data
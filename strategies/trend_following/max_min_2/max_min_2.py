@@ -1,10 +1,4 @@
 from backtesting import Backtest, Strategy
-from backtesting.test import SMA, GOOG
-import sys
-import os
-
-# Append the path of the root directory to sys.path
-sys.path.append(os.path.dirname(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))))
 
 from helpers.indicators import highest, lowest, atr
 
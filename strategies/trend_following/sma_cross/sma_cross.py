@@ -1,6 +1,7 @@
 from backtesting import Strategy
 from backtesting.lib import crossover
 from helpers.indicators import sma
+from helpers.vectorized import crossover as crossover_signals, indicator_start, strategy_params
 
 
 class SmaCross(Strategy):
@@ -37,6 +38,24 @@ class SmaCross(Strategy):
 			self.position.close()
 			self.sell()
 
+	@classmethod
+	def signals(cls, data, **params):
+		# next() as arrays, for helpers.vectorized.VectorizedBacktest
+		p = strategy_params(cls, params)
+		close = data.Close.to_numpy()
+
+		sma1 = sma(close, p.n1)
+		sma2 = sma(close, p.n2)
+		cross_up = crossover_signals(sma1, sma2)
+		cross_down = crossover_signals(sma2, sma1) & ~cross_up
+
+		return {
+			'entries': cross_up,
+			'short_entries': cross_down,
+			'exits': cross_up | cross_down,
+			'start': indicator_start(sma1, sma2),
+		}
+
 
 if __name__ == "__main__":
 	from backtesting.test import GOOG
@@ -1,11 +1,5 @@
 from backtesting import Strategy
 from backtesting.lib import crossover
-import pandas_ta as ta
-import sys
-import os
-
-# Append the path of the root directory to sys.path
-sys.path.append(os.path.dirname(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))))
 
 from helpers.indicators import supertrend, dema
 
@@ -32,7 +26,7 @@ class Supertrend(Strategy):
 	def init(self):
 		# Precompute the moving averages
 		self.supertrend = self.I(supertrend, self.data.High, self.data.Low, self.data.Close, self.supertrend_length, self.supertrend_mult, overlay=True)
-		self.dema = self.I(dema, self.data.High, self.data.Low, self.dema_length)
+		self.dema = self.I(dema, self.data.Close, self.dema_length)
 
 	def next(self):
 		if (self.data.Close > self.dema and
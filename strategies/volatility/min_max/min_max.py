@@ -3,6 +3,7 @@ import warnings
 
 from helpers.functions import get_ohlc_data
 from helpers.indicators import highest, lowest, atr
+from helpers.vectorized import indicator_start, strategy_params
 
 
 class MinMax(Strategy):
@@ -36,6 +37,24 @@ class MinMax(Strategy):
 			if self.data.High == self.highest[-1]:
 				self.position.close()
 
+	@classmethod
+	def signals(cls, data, **params):
+		# next() as arrays, for helpers.vectorized.VectorizedBacktest
+		p = strategy_params(cls, params)
+		high, low, close = data.High.to_numpy(), data.Low.to_numpy(), data.Close.to_numpy()
+
+		highest_values = highest(high, p.highest_length)
+		lowest_values = lowest(low, p.lowest_length)
+		atr_values = atr(high, low, close, p.atr_length)
+
+		return {
+			'entries': low == lowest_values,
+			'exits': high == highest_values,
+			'sl': close - 2 * atr_values,
+			'start': indicator_start(highest_values, lowest_values, atr_values),
+			'flat_entries': True,
+		}
+
 
 if __name__ == "__main__":
 	warnings.filterwarnings('ignore')
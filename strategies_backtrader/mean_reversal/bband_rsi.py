@@ -3,6 +3,9 @@ import os
 import sys
 from datetime import date, datetime
 
+from helpers.backtrader_events import EventRecorder
+from helpers.backtrader_indicators import Streak
+
 DEBUG_DATE = '2023-02-09'
 
 
@@ -10,6 +13,7 @@ class BBandRsi(bt.Strategy):
 	params = (
 		('rsi_length', 2),
 		('sma_length', 200),
+		('sma_streak', 6),
 		('bbands_length', 20),
 		('bbands_stddev', 2.5),
 		('order_time_max', 5),
@@ -20,7 +24,8 @@ class BBandRsi(bt.Strategy):
 		('stoploss_factor', 0.05),
 		('buy_limit_offset', 0.0),
 		('sell_limit_offset', 0),
-		('do_logging', True),
+		('do_logging', False),
+		('log_path', None),  # .parquet or .csv file the events are written to, printed when None
 	)
 
 	def __init__(self):
@@ -29,21 +34,18 @@ class BBandRsi(bt.Strategy):
 		self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_length)
 		self.bbands = bt.indicators.BollingerBands(self.data.close, period=self.params.bbands_length,
 												   devfactor=self.params.bbands_stddev)
+		self.low_above_sma = Streak(self.data.low > self.sma)
 		self.active_order = None
 		self.entry_date = None
 		self.order_creation = None
 
-	def log(self, txt, dt=None, skiplines=0, log=None):
+		# orders, fills and trades, recorded only when logging
+		self.events = EventRecorder() if self.params.do_logging or self.params.log_path else None
+
+	def log(self, txt, dt=None, skiplines=0):
 		""" Logging function for this strategy """
 		dt = dt or self.datas[0].datetime.date(0)
-
-		# if not log:
-		# 	log = self.params.do_logging
-
-		if log or self.params.do_logging:
-			print(skiplines*'\n' + f'{dt.isoformat()} {txt}')
-		else:
-			return
+		print(skiplines*'\n' + f'{dt.isoformat()} {txt}')
 
 	def get_size(self, price):
 		""" Calculate the number of shares to buy based on the current price and available cash. """
@@ -67,13 +69,14 @@ class BBandRsi(bt.Strategy):
 				self.active_order = None
 		else:
 			if not self.position:
-				if all(self.data.low[-1 * i] > self.sma[-1 * i] for i in range(0, 6)):
+				if self.low_above_sma[0] >= self.params.sma_streak:
 					if self.data.close[0] < self.bbands.bot[0]:
 						order_size = self.get_size(self.datas[0].close[0])
 						price = self.data.low[0]*(1 - self.params.buy_limit_offset)
 
 						self.active_order = self.buy(size=order_size, price=price, exectype=bt.Order.Limit)
-						self.log(f'BUY SIGNAL AT {price}', skiplines=1)
+						if self.events is not None:
+							self.events.order(self.data.datetime[0], self.active_order, note='buy signal')
 
 						self.order_creation = len(self)
 			else:
@@ -87,37 +90,33 @@ class BBandRsi(bt.Strategy):
 		if order.status in [order.Submitted, order.Accepted]:
 			return
 
+		if self.events is not None:
+			self.events.notify_order(self.data.datetime[0], order)
+
 		if order.status in [order.Completed]:
 			if order.isbuy():
-				self.log(
-					f'BUY EXECUTED, Price: {round(order.executed.price, 2)}, Cost: {round(order.executed.value, 2)}, Comm {round(order.executed.comm, 2)}')
-
 				self.entry_date = len(self)
 				self.order_creation = None
 				self.active_order = None
 			elif order.issell():
-				self.log(
-					f'SELL EXECUTED, Price: {round(order.executed.price, 2)}, Cost: {round(order.executed.value, 2)}, Comm {round(order.executed.comm, 2)}')
 				self.entry_date = None
 
 		elif order.status in [order.Canceled, order.Margin, order.Rejected]:
-			self.log('Order Canceled/Margin/Rejected')
-
 			if order.isbuy():
 				self.order_creation = None
 
 	def notify_trade(self, trade):
-		if not trade.isclosed:
-			return
-
-		self.log('OPERATION PROFIT, GROSS: %.2f, NET: %.2f' %
-				 (trade.pnl, trade.pnlcomm))
+		if self.events is not None:
+			self.events.notify_trade(self.data.datetime[0], trade)
 
 	def stop(self):
 		if self.position:
 			self.close()
 
-		self.log(f'(bbands_stddev {self.params.bbands_stddev}, rsi_upper_limit {self.params.rsi_upper_limit}) Ending Value {round(self.broker.getvalue(), 2)}', skiplines=1, log=True)
+		if self.events is not None:
+			self.events.flush(self.params.log_path)
+
+		self.log(f'(bbands_stddev {self.params.bbands_stddev}, rsi_upper_limit {self.params.rsi_upper_limit}) Ending Value {round(self.broker.getvalue(), 2)}', skiplines=1)
 
 
 if __name__ == '__main__':
@@ -3,13 +3,17 @@ import os
 import sys
 from datetime import date
 
+from helpers.backtrader_events import EventRecorder
+
 DEBUG_DATE = '2014-04-14'
 
 
 class NineOne(bt.Strategy):
     params = (
         ('ema_length', 9),
-        ('max_order_duration', 1)
+        ('max_order_duration', 1),
+        ('do_logging', False),
+        ('log_path', None),  # .parquet or .csv file the events are written to, printed when None
     )
 
     def __init__(self):
@@ -17,10 +21,13 @@ class NineOne(bt.Strategy):
         self.order = None  # To track the current order
         self.stop_loss_order = None
 
-    def log(self, txt, dt=None):
+        # orders, fills and notes, recorded only when logging
+        self.events = EventRecorder() if self.params.do_logging or self.params.log_path else None
+
+    def log(self, txt):
         """ Logging function for this strategy """
-        dt = dt or self.datas[0].datetime.date(0)
-        print(f'{dt.isoformat()} {txt}')
+        if self.events is not None:
+            self.events.note(self.data.datetime[0], txt)
 
     def get_size(self, price):
         """ Calculate the number of shares to buy based on the current price and available cash. """
@@ -72,16 +79,18 @@ class NineOne(bt.Strategy):
         if not self.position:
             if (self.ema[0] > self.ema[-1] and self.ema[-1] < self.ema[-2] and self.ema[-2] < self.ema[-3]) and (self.ema[0] < close):
                 if not self.order:
-                    self.log(f'Buy signal at {high}')
                     self.order = self.buy(size=order_size, price=high, exectype=bt.Order.Stop)
+                    if self.events is not None:
+                        self.events.order(self.data.datetime[0], self.order, note='buy signal')
                     self.order_age = len(self)
                     self.stop_loss_price = low
         else:
             # Condition to exit the trade
             if (close < self.ema[0]) and self.ema[0] < self.ema[-1]:
                 if not self.order:
-                    self.log(f'Sell signal at {low}')
                     self.order = self.close(price=low, exectype=bt.Order.Stop)
+                    if self.events is not None:
+                        self.events.order(self.data.datetime[0], self.order, note='sell signal')
                     self.order_age = len(self)
 
                     self.cancel(self.stop_loss_order)
@@ -92,21 +101,24 @@ class NineOne(bt.Strategy):
         if order.status in [order.Submitted, order.Accepted]:
             return
 
-        if order.status in [order.Completed]:
-            if order.isbuy():
-                self.log(f'BUY EXECUTED, Price: {order.executed.price}, Cost: {order.executed.value}, Comm {order.executed.comm}')
-            elif order.issell():
-                self.log(f'SELL EXECUTED, Price: {order.executed.price}, Cost: {order.executed.value}, Comm {order.executed.comm}')
-
-                self.cancel(self.stop_loss_order)
-                self.stop_loss_order = None
+        if self.events is not None:
+            self.events.notify_order(self.data.datetime[0], order)
 
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
-            self.log('Order Canceled/Margin/Rejected')
+        if order.status in [order.Completed] and order.issell():
+            self.cancel(self.stop_loss_order)
+            self.stop_loss_order = None
 
         if order == self.order:
             self.order = None  # No pending orders
 
+    def notify_trade(self, trade):
+        if self.events is not None:
+            self.events.notify_trade(self.data.datetime[0], trade)
+
+    def stop(self):
+        if self.events is not None:
+            self.events.flush(self.params.log_path)
+
 
 if __name__ == '__main__':
     from datetime import datetime
@@ -144,7 +156,7 @@ if __name__ == '__main__':
     cerebro.addobserver(bt.observers.BuySell)
 
     # Add the strategy
-    cerebro.addstrategy(NineOne)
+    cerebro.addstrategy(NineOne, do_logging=True)
 
     # Add a strategy
     # strats = cerebro.optstrategy(
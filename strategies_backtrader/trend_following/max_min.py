@@ -2,12 +2,15 @@ import backtrader as bt
 import os
 import sys
 
+from helpers.backtrader_events import EventRecorder
+
 
 class MaxMinStrategy(bt.Strategy):
 	params = (
 		('highest_period', 20),
 		('lowest_period', 10),
 		('printlog', False),
+		('log_path', None),  # .parquet or .csv file the events are written to, printed when None
 	)
 
 	def __init__(self):
@@ -24,6 +27,9 @@ class MaxMinStrategy(bt.Strategy):
 
 		self.order = None  # To track the current order
 
+		# orders, fills and trades, recorded only when logging
+		self.events = EventRecorder() if self.params.printlog or self.params.log_path else None
+
 	def get_size(self, price):
 		""" Calculate the number of shares to buy based on the current price and available cash. """
 		cash = self.broker.get_cash()
@@ -41,33 +47,17 @@ class MaxMinStrategy(bt.Strategy):
 			# Buy/Sell order submitted/accepted to/by broker - Nothing to do
 			return
 
-		# Check if an order has been completed
-		# Attention: broker could reject order if not enough cash
-		if order.status in [order.Completed]:
-			if order.isbuy():
-				self.log(
-					'BUY EXECUTED, Price: %.2f, Cost: %.2f, Comm %.2f' %
-					(order.executed.price,
-					 order.executed.value,
-					 order.executed.comm))
-
-				self.buyprice = order.executed.price
-				self.buycomm = order.executed.comm
-			else:  # Sell
-				self.log('SELL EXECUTED, Price: %.2f, Cost: %.2f, Comm %.2f' %
-						 (order.executed.price,
-						  order.executed.value,
-						  order.executed.comm))
-
-		elif order.status in [order.Canceled, order.Margin, order.Rejected]:
-			self.log('Order Canceled/Margin/Rejected')
+		# fills, and orders the broker cancelled or rejected (for instance when there is not enough cash)
+		if self.events is not None:
+			self.events.notify_order(self.data.datetime[0], order)
 
-	def notify_trade(self, trade):
-		if not trade.isclosed:
-			return
+		if order.status in [order.Completed] and order.isbuy():
+			self.buyprice = order.executed.price
+			self.buycomm = order.executed.comm
 
-		self.log('OPERATION PROFIT, GROSS %.2f, NET %.2f' %
-				 (trade.pnl, trade.pnlcomm))
+	def notify_trade(self, trade):
+		if self.events is not None:
+			self.events.notify_trade(self.data.datetime[0], trade)
 
 	def next(self):
 		order_size = self.get_size(self.datas[0].close[0])
@@ -89,6 +79,9 @@ class MaxMinStrategy(bt.Strategy):
 			self.order = self.close(exectype=bt.Order.Stop, price=self.lowest_minus_1[0])
 
 	def stop(self):
+		if self.events is not None:
+			self.events.flush(self.params.log_path)
+
 		self.log(f'(highest len {self.params.highest_period}, lowest period {self.params.lowest_period}) Ending Value {self.broker.getvalue()}', doprint=True)
 
 
@@ -0,0 +1,41 @@
+import numpy as np
+
+from helpers.functions import DATA_DIR, CsvDirectoryProvider, get_ohlc_panel, panel_to_array
+
+PRICES = ['Open', 'High', 'Low', 'Close']
+
+provider = CsvDirectoryProvider(DATA_DIR)
+
+
+def panel(compact, how='inner'):
+	# BTC trades on weekends, so the outer calendar leaves gaps in the other tickers
+	result, errors = get_ohlc_panel(
+		['SPY', 'AAPL', 'BTC'], '2020-01-01', '2021-01-01', '1d', provider=provider, how=how, compact=compact
+	)
+	assert not errors
+
+	return result
+
+
+def test_compact_panel_gives_a_float32_array():
+	array, tickers, dates, fields = panel_to_array(panel(compact=True), PRICES)
+
+	assert array.dtype == np.float32
+	assert array.shape == (len(tickers), len(dates), len(fields))
+	np.testing.assert_array_equal(array, panel_to_array(panel(compact=False), PRICES)[0].astype(np.float32))
+
+
+def test_volumes_stay_exact():
+	compact = panel(compact=True, how='outer')
+	array, tickers, _, fields = panel_to_array(compact)
+
+	assert array.dtype == np.float64
+	assert compact[('SPY', 'Volume')].dtype == np.float64
+
+	full = panel(compact=False, how='outer')
+	for i, ticker in enumerate(tickers):
+		np.testing.assert_array_equal(array[i, :, fields.index('Volume')], full[(ticker, 'Volume')].to_numpy(dtype=float))
+
+
+def test_default_panel_gives_a_float64_array():
+	assert panel_to_array(panel(compact=False))[0].dtype == np.float64
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from helpers import indicators
+from helpers import streaming_indicators as streaming
+from helpers.functions import DATA_DIR, CsvDirectoryProvider
+
+TICKERS = ['AAPL', 'ABEV3', 'BTC', 'MSFT', 'SPY']
+LENGTHS = [1, 2, 3, 14, 50, 200]
+
+provider = CsvDirectoryProvider(DATA_DIR)
+
+
+def stream(indicator, *columns):
+	return np.array([indicator.update(*values) for values in zip(*columns)], dtype=float)
+
+
+def assert_within(streamed, batch, bound, scale=None):
+	# same missing values, and differences below bound times the scale (the batch values themselves by default)
+	streamed, batch = np.asarray(streamed, dtype=float), np.asarray(batch, dtype=float)
+	scale = np.abs(batch if scale is None else scale)
+
+	assert np.array_equal(np.isnan(streamed), np.isnan(batch))
+	assert np.all(np.abs(streamed - batch)[~np.isnan(batch)] <= bound * scale[~np.isnan(batch)])
+
+
+@pytest.fixture(scope='module', params=TICKERS)
+def data(request):
+	return provider.get_ohlc_data(request.param, '1990-01-01', '2030-01-01', '1d')
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_moving_averages(data, length):
+	close = data.Close.to_numpy()
+
+	assert_within(stream(streaming.StreamingSma(length), close), indicators.sma(close, length), 1e-12)
+	assert_within(stream(streaming.StreamingEma(length), close), indicators.ema(close, length), 1e-14)
+	assert_within(stream(streaming.StreamingRsi(length), close), indicators.rsi(close, length), 1e-14)
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_atr(data, length):
+	high, low, close = data.High.to_numpy(), data.Low.to_numpy(), data.Close.to_numpy()
+
+	streamed = stream(streaming.StreamingAtr(length), high, low, close)
+
+	assert_within(streamed, indicators.atr(high, low, close, length), 1e-11)
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_bbands(data, length):
+	close = data.Close.to_numpy()
+	batch = indicators.bbands(close, length)
+
+	assert_within(stream(streaming.StreamingBBands(length), close).T, batch, 1e-9, scale=batch[[1, 1, 1]])
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_highest_lowest(data, length):
+	high, low = data.High.to_numpy(), data.Low.to_numpy()
+
+	np.testing.assert_array_equal(stream(streaming.StreamingHighest(length), high), indicators.highest(high, length))
+	np.testing.assert_array_equal(stream(streaming.StreamingLowest(length), low), indicators.lowest(low, length))
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+@pytest.mark.parametrize('rolling_length', [2, 5, 20])
+def test_sma_std(data, length, rolling_length):
+	close = data.Close.to_numpy()
+	streamed = stream(streaming.StreamingSmaStd(length, rolling_length), close)
+
+	assert_within(streamed, indicators.sma_std(close, length, rolling_length), 1e-7, scale=indicators.sma(close, length))
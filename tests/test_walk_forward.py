@@ -0,0 +1,42 @@
+import pandas as pd
+
+from results.strategy_tester import _walk_forward_windows
+
+
+def windows(end, anchored=False):
+	index = pd.bdate_range('2020-01-01', end)
+	return index, _walk_forward_windows(index, pd.Timedelta('56D'), pd.Timedelta('28D'), anchored)
+
+
+def test_windows_cover_whole_test_periods():
+	index, result = windows('2020-12-31')
+
+	assert len(result) == 11
+	for train_start, test_start, test_end in result:
+		assert index[test_end - 1] - index[test_start] < pd.Timedelta('28D')
+		assert index[test_start] - index[train_start] <= pd.Timedelta('56D')
+
+	# test windows follow each other
+	assert all(previous[2] == following[1] for previous, following in zip(result, result[1:]))
+
+
+def test_last_window_with_a_few_candles_is_dropped():
+	# the 12th test window starts on 2020-12-30, the last candle of the data, and would hold that candle only
+	_, full = windows('2020-12-29')
+	index, result = windows('2020-12-30')
+
+	assert len(result) == 11
+	assert result == full
+	assert result[-1][2] == len(index) - 1
+
+
+def test_window_ending_with_the_data_is_kept():
+	index, result = windows('2021-01-26')
+
+	assert result[-1][2] == len(index)
+
+
+def test_anchored_train_windows_start_with_the_data():
+	_, result = windows('2020-12-31', anchored=True)
+
+	assert all(train_start == 0 for train_start, _, _ in result)